@@ -2,3 +2,4 @@ from agents.agent import Agent
 from agents.monte_carlo_agent import MonteCarloAgent
 from agents.human_agent import HumanAgent
 from agents.random_agent import RandomAgent
+from agents.alpha_beta_agent import AlphaBetaAgent
@@ -12,3 +12,8 @@ class Agent:
 
     def reset(self):
         raise NotImplementedError
+
+    def close(self):
+        """Release anything the agent holds beyond its games, such as
+        worker processes.  Does nothing unless an agent overrides it."""
+        pass
@@ -0,0 +1,291 @@
+from agents.agent import Agent
+from game.board import state_key
+from game.bitboard import BitBoard
+from game.endgame import solve, empties, DEFAULT_EMPTIES
+from game.symmetry import canonical_key, transform_move, untransform_move
+from util import info, opponent, BLACK, CacheDict, SearchBudget
+
+INFINITY = 10 ** 9
+
+# a finished game scores its disc differential times this, which is more
+# than any heuristic evaluation, so a won ending beats any unfinished line
+TERMINAL_WEIGHT = 10000
+
+# heuristic value of a stone on each kind of square, and of each legal move
+CORNER_WEIGHT = 100
+X_SQUARE_WEIGHT = -50  # diagonally next to a corner
+C_SQUARE_WEIGHT = -20  # on an edge, next to a corner
+EDGE_WEIGHT = 10
+INNER_WEIGHT = 1
+MOBILITY_WEIGHT = 5
+
+# each iteration after the first few searches this far either side of
+# the last iteration's value, and again with a full window if it falls out
+ASPIRATION_WINDOW = 50
+ASPIRATION_MIN_DEPTH = 3
+
+# transposition table entry flags: how the stored value bounds the real one
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+KILLERS_PER_PLY = 2
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget runs out."""
+
+
+def square_weights(size):
+    """Return the heuristic weight of each square, indexed y * size + x."""
+    last = size - 1
+    weights = []
+    for y in range(size):
+        for x in range(size):
+            edge_x, edge_y = x in (0, last), y in (0, last)
+            near_x, near_y = x in (1, last - 1), y in (1, last - 1)
+            if edge_x and edge_y:
+                weights.append(CORNER_WEIGHT)
+            elif near_x and near_y:
+                weights.append(X_SQUARE_WEIGHT)
+            elif (edge_x and near_y) or (edge_y and near_x):
+                weights.append(C_SQUARE_WEIGHT)
+            elif edge_x or edge_y:
+                weights.append(EDGE_WEIGHT)
+            else:
+                weights.append(INNER_WEIGHT)
+    return weights
+
+
+def weight_masks(size):
+    """Group the squares by weight into a list of (weight, mask) pairs,
+    where bit y * size + x of mask stands for square x,y."""
+    masks = {}
+    for square, weight in enumerate(square_weights(size)):
+        masks[weight] = masks.get(weight, 0) | (1 << square)
+    return sorted(masks.items())
+
+
+def board_masks(board, color):
+    """Return the (own, opponent) masks of any Board from color's view."""
+    if isinstance(board, BitBoard):
+        return board.masks(color)
+    own = opp = 0
+    enemy = opponent[color]
+    square = 0
+    for row in board.board:
+        for piece in row:
+            if piece == color:
+                own |= 1 << square
+            elif piece == enemy:
+                opp |= 1 << square
+            square += 1
+    return own, opp
+
+
+class AlphaBetaAgent(Agent):
+    """
+    An agent that searches with iterative-deepening negamax and alpha-beta
+    pruning until search_time runs out, or max_depth is reached.
+    Positions are remembered in a transposition table keyed by state_key,
+    or by canonical_key so that symmetric positions share entries,
+    and moves are tried best-first: the table's move, then killer moves,
+    then by history score.  Moves are made and unmade on the caller's
+    board, which is left as it was found.
+    """
+
+    def __init__(self, reversi, color, **kwargs):
+        self.reversi = reversi
+        self.color = color
+        self.search_time = kwargs.get('search_time', 1)
+        self.max_depth = kwargs.get('max_depth', reversi.size ** 2)
+
+        # solve the game exactly once this few empty squares are left
+        # (0 to always search); the solver only handles 8x8 boards
+        self.endgame_empties = kwargs.get(
+            'endgame_empties', DEFAULT_EMPTIES if reversi.size == 8 else 0)
+
+        # key: (depth, value, flag, best move)
+        self.table = CacheDict(kwargs.get('table_size', 100000))
+
+        # key the table by canonical_key, storing best moves as they are
+        # in the canonical image of each position
+        self.symmetry = kwargs.get('symmetry', True)
+        self.weight_masks = weight_masks(reversi.size)
+
+        self.killers = []
+        self.history = {}
+        self.nodes = 0
+        self.budget = None
+
+    def reset(self):
+        pass
+
+    def observe_win(self, winner):
+        pass
+
+    def get_action(self, game_state, legal_moves):
+        """
+        Interface from class Agent.  Given a game state
+        and a set of legal moves, pick a legal move and return it.
+        """
+        if not legal_moves:
+            return None
+        elif len(legal_moves) == 1:
+            return legal_moves[0]
+
+        empty_squares = empties(game_state[0])
+        if empty_squares <= self.endgame_empties:
+            differential, move = solve(*game_state)
+            info('solved endgame: {} finishes {:+d}'.format(move, differential))
+            return move
+
+        self.killers = [[] for _ in range(empty_squares + 1)]
+        self.history = {}
+        self.nodes = 0
+        self.budget = SearchBudget(self.search_time)
+
+        best_move = legal_moves[0]
+        value = 0
+        for depth in range(1, min(self.max_depth, empty_squares) + 1):
+            try:
+                value = self.aspiration_search(game_state, depth, value)
+            except SearchTimeout:
+                break
+
+            key, transform = self.table_key(game_state)
+            entry = self.table.get(key)
+            if entry is not None and entry[3] is not None:
+                best_move = untransform_move(entry[3], transform, self.reversi.size)
+            info('depth {}: {} ({})'.format(depth, best_move, value))
+
+        info('{} nodes searched.'.format(self.nodes))
+        return best_move
+
+    def aspiration_search(self, game_state, depth, guess):
+        """Search to depth within a narrow window around guess, the last
+        iteration's value, and with a full window if the value falls out."""
+        if depth >= ASPIRATION_MIN_DEPTH:
+            alpha = guess - ASPIRATION_WINDOW
+            beta = guess + ASPIRATION_WINDOW
+            value = self.negamax(game_state, depth, alpha, beta, 0)
+            if alpha < value < beta:
+                return value
+        return self.negamax(game_state, depth, -INFINITY, INFINITY, 0)
+
+    def negamax(self, game_state, depth, alpha, beta, ply):
+        """Return the value of game_state to the side to move, searched
+        to depth.  A value outside alpha, beta is only a bound."""
+        self.nodes += 1
+        if not self.budget.running(self.nodes):
+            raise SearchTimeout
+
+        original_alpha = alpha
+        key, transform = self.table_key(game_state)
+        table_move = None
+        entry = self.table.get(key)
+        if entry is not None:
+            entry_depth, value, flag, table_move = entry
+            table_move = untransform_move(table_move, transform, self.reversi.size)
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                elif flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        board, color = game_state
+        legal_moves = self.reversi.legal_moves(game_state)
+        if not legal_moves:
+            if not self.reversi.legal_moves((board, opponent[color])):
+                return self.final_score(board, color)
+            # pass the turn, which doesn't count as a ply of depth
+            next_state, undo = self.reversi.make_move(game_state, None)
+            try:
+                return -self.negamax(next_state, depth, -beta, -alpha, ply + 1)
+            finally:
+                self.reversi.unmake_move(undo)
+
+        if depth == 0:
+            return self.evaluate(game_state, legal_moves)
+
+        best_value = -INFINITY
+        best_move = None
+        for move in self.order_moves(legal_moves, table_move, ply):
+            next_state, undo = self.reversi.make_move(game_state, move)
+            try:
+                value = -self.negamax(next_state, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                self.reversi.unmake_move(undo)
+
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self.record_cutoff(move, depth, ply)
+                break
+
+        if best_value <= original_alpha:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.update(key, (depth, best_value, flag,
+                                transform_move(best_move, transform, self.reversi.size)))
+        return best_value
+
+    def table_key(self, game_state):
+        """Return the transposition table key for game_state, and the
+        transform from the position to the one the key stands for."""
+        if self.symmetry:
+            return canonical_key(game_state)
+        return state_key(game_state), 0
+
+    def order_moves(self, legal_moves, table_move, ply):
+        """Return legal_moves sorted best-first: the transposition table's
+        move, then this ply's killer moves, then the rest by history."""
+        killers = self.killers[ply] if ply < len(self.killers) else []
+
+        def score(move):
+            if move == table_move:
+                return INFINITY
+            if move in killers:
+                return INFINITY - 1 - killers.index(move)
+            return self.history.get(move, 0)
+
+        return sorted(legal_moves, key=score, reverse=True)
+
+    def record_cutoff(self, move, depth, ply):
+        """Remember a move that caused a beta cutoff, as a killer move for
+        this ply and in the history table, weighted by remaining depth."""
+        self.history[move] = self.history.get(move, 0) + depth * depth
+        if ply < len(self.killers):
+            killers = self.killers[ply]
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[KILLERS_PER_PLY:]
+
+    def evaluate(self, game_state, legal_moves):
+        """Heuristic value of an unfinished game to the side to move:
+        weighted squares held, plus mobility."""
+        board, color = game_state
+        own, opp = board_masks(board, color)
+        value = 0
+        for weight, mask in self.weight_masks:
+            value += weight * ((own & mask).bit_count() - (opp & mask).bit_count())
+        opponent_moves = self.reversi.legal_moves((board, opponent[color]))
+        return value + MOBILITY_WEIGHT * (len(legal_moves) - len(opponent_moves))
+
+    @staticmethod
+    def final_score(board, color):
+        """Value of a finished game to color."""
+        black_count, white_count = board.get_stone_counts()
+        diff = black_count - white_count
+        if color != BLACK:
+            diff = -diff
+        return TERMINAL_WEIGHT * diff
@@ -0,0 +1,123 @@
+import math
+import random
+import numpy as np
+
+PASS = 255  # move code for passing the turn; other moves are y * size + x
+UNEXPANDED = -1  # first_child of a node whose children aren't allocated yet
+C = 1  # 'exploration' value, as in MonteCarloAgent.best_child
+
+
+class ArrayTree:
+    """
+    A Monte Carlo search tree stored as parallel NumPy arrays indexed by
+    node number, instead of one Python object per node.  A node's children
+    are allocated together in one contiguous block when it is expanded, so
+    the block [first_child, first_child + child_count) replaces a children
+    list, each child's next sibling is simply the next index, and UCT can
+    be computed for all of a node's children at once.
+    A child with zero plays has not been tried yet.
+    """
+
+    def __init__(self, capacity=1024, rng=random):
+        self.rng = rng  # anything with a choice() method, like random.Random
+        self.size = 0  # nodes in use
+        self.wins = np.zeros(capacity, dtype=np.float64)
+        self.plays = np.zeros(capacity, dtype=np.float64)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, UNEXPANDED, dtype=np.int32)
+        self.child_count = np.zeros(capacity, dtype=np.uint8)
+        self.move = np.full(capacity, PASS, dtype=np.uint8)
+        self.black_to_move = np.zeros(capacity, dtype=bool)
+
+    def allocate(self, amount):
+        """Reserve amount consecutive nodes, growing the arrays if needed.
+        Returns the index of the first one."""
+        start = self.size
+        self.size += amount
+        capacity = len(self.wins)
+        if self.size > capacity:
+            new_capacity = max(capacity * 2, self.size)
+            self.wins = self.grown(self.wins, new_capacity, 0)
+            self.plays = self.grown(self.plays, new_capacity, 0)
+            self.parent = self.grown(self.parent, new_capacity, -1)
+            self.first_child = self.grown(self.first_child, new_capacity, UNEXPANDED)
+            self.child_count = self.grown(self.child_count, new_capacity, 0)
+            self.move = self.grown(self.move, new_capacity, PASS)
+            self.black_to_move = self.grown(self.black_to_move, new_capacity, False)
+        return start
+
+    @staticmethod
+    def grown(array, capacity, fill):
+        result = np.full(capacity, fill, dtype=array.dtype)
+        result[:len(array)] = array
+        return result
+
+    def add_root(self, black_to_move):
+        root = self.allocate(1)
+        self.black_to_move[root] = black_to_move
+        return root
+
+    def is_expanded(self, node):
+        return self.first_child[node] != UNEXPANDED
+
+    def expand(self, node, moves, board_size):
+        """Allocate one child of node per move, where a move is an x,y
+        position or None for a pass.  An empty list marks a finished game."""
+        assert board_size ** 2 <= PASS, 'board too large for one-byte moves'
+        start = self.allocate(len(moves))
+        end = start + len(moves)
+        self.first_child[node] = start
+        self.child_count[node] = len(moves)
+        self.parent[start:end] = node
+        self.black_to_move[start:end] = not self.black_to_move[node]
+        for i, move in enumerate(moves):
+            if move is not None:
+                self.move[start + i] = move[1] * board_size + move[0]
+
+    def select_child(self, node, enemy_turn):
+        """Pick which child of an expanded node to visit: a random untried
+        child if there is one, otherwise the best child by UCT."""
+        start = self.first_child[node]
+        end = start + self.child_count[node]
+        plays = self.plays[start:end]
+        untried = np.flatnonzero(plays == 0)
+        if len(untried):
+            return start + int(self.rng.choice(untried))
+
+        wins = self.wins[start:end]
+        if enemy_turn:
+            # the enemy will play against us, not for us
+            wins = plays - wins
+        values = wins / plays + C * np.sqrt(2 * math.log(self.plays[node]) / plays)
+        return start + int(np.argmax(values))
+
+    def back_prop(self, node, delta):
+        while node != -1:
+            self.plays[node] += 1
+            self.wins[node] += delta
+            node = self.parent[node]
+
+    def move_at(self, node, board_size):
+        """The move that led from node's parent to node, as x,y or None."""
+        code = int(self.move[node])
+        if code == PASS:
+            return None
+        return code % board_size, code // board_size
+
+    def child_results(self, node, board_size):
+        """Return node's tried children as a dict of move: (wins, plays)."""
+        start = self.first_child[node]
+        if start == UNEXPANDED:
+            return {}
+        results = {}
+        for child in range(start, start + self.child_count[node]):
+            if self.plays[child] > 0:
+                results[self.move_at(child, board_size)] = (
+                    int(self.wins[child]), int(self.plays[child]))
+        return results
+
+    def nbytes(self):
+        """Memory held by the node arrays, including unused capacity."""
+        return sum(array.nbytes for array in (
+            self.wins, self.plays, self.parent, self.first_child,
+            self.child_count, self.move, self.black_to_move))
@@ -1,9 +1,45 @@
 import random
 import time
 import math
+import multiprocessing
+import threading
 import copy
+from contextlib import nullcontext
 from agents.agent import Agent
-from util import info, opponent
+from agents.array_tree import ArrayTree
+from game.board import state_key
+from game.bitboard import BitBoard
+from game.playout import random_playout
+from game.endgame import solve, empties, DEFAULT_EMPTIES
+from game.opening_book import OpeningBook, DEFAULT_MIN_PLAYS
+from util import info, opponent, BLACK, SearchBudget, SearchStats, counters
+
+# plays a thread adds to each node it passes through, taken back once its
+# result is propagated, so other threads prefer different paths meanwhile
+VIRTUAL_LOSS = 3
+
+# when the tree outgrows max_nodes, leaves are dropped until it is this
+# fraction of max_nodes, so the cost of a collection is spread out
+RECYCLE_TARGET = 0.9
+
+C = 1  # 'exploration' value
+
+# EXPLORATION[n] is sqrt(2 * log(n)) and INVERSE_SQRT[n] is 1 / sqrt(n),
+# for the play counts best_child looks up.  Both only ever grow.
+EXPLORATION = [0.0]
+INVERSE_SQRT = [0.0]
+uct_tables_lock = threading.Lock()
+
+
+def grow_uct_tables(size):
+    """Extend the UCT tables to hold at least size entries.  INVERSE_SQRT
+    is grown first, so a thread that has checked len(EXPLORATION) can
+    always index INVERSE_SQRT with a child's smaller play count."""
+    with uct_tables_lock:
+        for n in range(len(INVERSE_SQRT), size):
+            INVERSE_SQRT.append(1 / math.sqrt(n))
+        for n in range(len(EXPLORATION), size):
+            EXPLORATION.append(math.sqrt(2 * math.log(n)))
 
 
 class MonteCarloAgent(Agent):
@@ -13,27 +49,93 @@ class MonteCarloAgent(Agent):
         self.reversi = reversi
         self.sim_time = kwargs.get('sim_time', 5)
 
+        # a fixed number of simulations per move, used instead of sim_time
+        self.sim_count = kwargs.get('sim_count', None)
+
+        # all of this agent's randomness comes from here, so a seed makes
+        # a search with a sim_count budget repeatable
+        self.rng = random.Random(kwargs.get('seed', None))
+
+        # with more than one worker, search with root parallelization
+        self.workers = kwargs.get('workers', 1)
+        self.pool = None
+        # the options each worker process builds its game and agent with
+        self.worker_args = {k: v for k, v in kwargs.items() if k not in WORKER_EXCLUDED}
+
+        # with more than one thread, search with tree parallelization
+        self.threads = kwargs.get('threads', 1)
+        self.virtual_loss = VIRTUAL_LOSS if self.threads > 1 else 0
+
+        # with several threads, held while walking down and growing the
+        # tree, and while recycling it, so that no thread's path can lose
+        # nodes under it; only playouts and back prop run concurrently
+        self.tree_lock = threading.Lock() if self.threads > 1 else nullcontext()
+
+        # store each move's search tree in NumPy arrays instead of Nodes
+        self.array_tree = kwargs.get('array_tree', False)
+
+        # optional cap on the number of nodes kept in the tree
+        self.max_nodes = kwargs.get('max_nodes', None)
+
+        # solve the game exactly once this few empty squares are left
+        # (0 to always search); the solver only handles 8x8 boards
+        self.endgame_empties = kwargs.get(
+            'endgame_empties', DEFAULT_EMPTIES if reversi.size == 8 else 0)
+
+        # an opening book file to play from before searching, if any
+        self.book = None
+        if kwargs.get('book', None):
+            self.book = OpeningBook(
+                kwargs['book'], kwargs.get('book_min_plays', DEFAULT_MIN_PLAYS))
+
         # map states to nodes for quick lookup
-        self.tree_manager = TreeManager(self.reversi)
+        self.tree_manager = TreeManager(self.reversi, self.max_nodes)
+
+        # statistics of the last search, and of every search so far
+        self.stats = SearchStats()
+        self.total_stats = SearchStats()
+
+        # the threads of a tree-parallel search each count into their own
+        # SearchStats, kept here, which are added up once they finish
+        self.local = threading.local()
 
     def reset(self):
-        pass
+        # nothing from the last game's tree will be reached again
+        self.tree_manager = TreeManager(self.reversi, self.max_nodes)
 
     def observe_win(self, winner):
         pass
 
+    def close(self):
+        """Shut down the root-parallel worker processes, if any.  A later
+        search starts a new pool."""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
     def get_action(self, game_state, legal_moves):
         """
         Interface from class Agent.  Given a game state
         and a set of legal moves, pick a legal move and return it.
-        This will be called by the Reversi game object. Does not mutate
-        the game state argument.
+        This will be called by the Reversi game object. The search
+        makes and unmakes moves on the game state's board, but leaves
+        it exactly as it was found.
         """
         if not legal_moves:
             return None
 
-        # make a deep copy to keep the promise that we won't mutate
-        game_state = copy.deepcopy(game_state)
+        if self.book is not None:
+            move = self.book.lookup(game_state)
+            if move in legal_moves:
+                info('book move: {}'.format(move))
+                return move
+
+        if empties(game_state[0]) <= self.endgame_empties:
+            differential, move = solve(*game_state)
+            info('solved endgame: {} finishes {:+d}'.format(move, differential))
+            return move
+
         move = self.monte_carlo_search(game_state)
         return move
 
@@ -41,46 +143,218 @@ class MonteCarloAgent(Agent):
         """
         Given a game state, return the best action decided by
         using Monte Carlo Tree Search with an Upper Confidence Bound.
+        Statistics about the search are left in self.stats.  Root-parallel
+        workers count only simulations, as their engine calls and phase
+        times happen in other processes; an array tree search times no
+        phases either.
         """
+        self.stats = SearchStats()
+        calls_before = counters.snapshot()
+        hits_before = self.reversi.legal_cache.hits
+        start = time.time()
+
+        if self.workers > 1:
+            results, sim_count = self.root_parallel_search(game_state)
+        elif self.threads > 1:
+            results, sim_count = self.tree_parallel_search(game_state)
+        elif self.array_tree:
+            results, sim_count = self.array_tree_search(game_state)
+        else:
+            results, sim_count = self.search_tree(game_state)
 
-        root = self.tree_manager.get_node(game_state)
-
-        # even if this is a "recycled" node we've already used,
-        # remove its parent as it is now considered our root level node
-        root.parent = None
-
-        sim_count = 0
-        now = time.time()
-        while time.time() - now < self.sim_time:
-            # pick move to simulate with UCT
-            picked_node = self.tree_policy(root)
-
-            # run the simulation and get the result
-            result = self.simulate(picked_node.game_state)
-
-            # back prop the result of this move up the tree
-            self.back_prop(picked_node, result)
-            sim_count += 1
+        self.stats.searches = 1
+        self.stats.simulations = sim_count
+        self.stats.seconds = time.time() - start
+        self.stats.add_counts(counters.since(calls_before))
+        self.stats.legal_cache_hits = self.reversi.legal_cache.hits - hits_before
+        self.total_stats.add(self.stats)
 
         # the following is purely for printing information
-        results = {}
-        for child in root.children:
-            wins, plays = child.get_wins_plays()
-            position = child.move
-            results[position] = (wins, plays)
-
         for position in sorted(results, key=lambda x: results[x][1]):
             wins, plays = results[position][0], results[position][1]
             info('{}: ({}/{}) ({:.2f})'.format(position,
                                                wins, plays, wins / plays))
         info('{} simulations performed.'.format(sim_count))
 
-        return self.best_action(root)
+        return self.best_action(results)
 
-    @staticmethod
-    def best_action(node):
+    def search_tree(self, game_state):
         """
-        Returns the best action from this game state node.
+        Grow this agent's tree from the given game state until the search
+        budget (sim_count simulations, or sim_time seconds) is spent.
+        Every iteration works on the game state's own board, making
+        moves on the way down the tree and unmaking them afterwards.
+        Returns the root's children as a dict of move: (wins, plays),
+        and the number of simulations performed.
+        """
+        root = self.get_root(game_state)
+
+        sim_count = 0
+        budget = SearchBudget(self.sim_time, self.sim_count)
+        while budget.running(sim_count):
+            self.search_once(root, game_state)
+            sim_count += 1
+            self.tree_manager.recycle(root)
+
+        results = {child.move: child.get_wins_plays() for child in root.children}
+        return results, sim_count
+
+    def tree_parallel_search(self, game_state):
+        """
+        Tree parallelization: several threads grow this agent's tree together
+        until the search budget is spent, each on its own copy of the game
+        state.  A sim_count budget is shared out evenly between the threads.
+        Walking down the tree, expanding it and recycling it are done by one
+        thread at a time, under the tree lock, which keeps the tree within
+        max_nodes.  Only playouts and back prop run concurrently: back prop
+        updates node statistics under each node's lock, and virtual loss
+        spreads the threads over different paths.  Playouts on a BitBoard
+        release the GIL, so they run truly in parallel.
+        Returns the same (results, sim_count) pair as search_tree.
+        """
+        root = self.get_root(game_state)
+
+        start = time.time()
+        sim_counts = [0] * self.threads
+        thread_stats = [SearchStats() for _ in range(self.threads)]
+
+        def search_until_spent(index, state, budget):
+            self.local.stats = thread_stats[index]
+            while budget.running(sim_counts[index]):
+                self.search_once(root, state)
+                sim_counts[index] += 1
+                with self.tree_lock:
+                    self.tree_manager.recycle(root)
+
+        threads = [
+            threading.Thread(target=search_until_spent,
+                             args=(i, copy.deepcopy(game_state),
+                                   SearchBudget(self.sim_time, share, start)))
+            for i, share in enumerate(split_sim_count(self.sim_count, self.threads))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for stats in thread_stats:
+            self.stats.add(stats)
+
+        results = {child.move: child.get_wins_plays() for child in root.children}
+        return results, sum(sim_counts)
+
+    def array_tree_search(self, game_state):
+        """
+        Like search_tree, but grows a fresh ArrayTree for this move instead
+        of a tree of Nodes.  A node is expanded, with all of its children at
+        once, the second time the search reaches it.
+        Returns the same (results, sim_count) pair as search_tree.
+        """
+        size = self.reversi.size
+        tree = ArrayTree(rng=self.rng)
+        root = tree.add_root(game_state[1] == BLACK)
+
+        sim_count = 0
+        budget = SearchBudget(self.sim_time, self.sim_count)
+        while budget.running(sim_count):
+            node = root
+            state = game_state
+            path = []
+            while True:
+                if not tree.is_expanded(node):
+                    moves = self.reversi.legal_moves(state)
+                    if not moves and self.reversi.winner(state[0]) is False:
+                        moves = [None]  # it can only make one move: pass turn
+                    tree.expand(node, moves, size)
+                if tree.child_count[node] == 0:
+                    break  # the game is over at this node
+
+                node = tree.select_child(node, state[1] != self.color)
+                state = self.make_move(state, tree.move_at(node, size), path)
+                if tree.plays[node] == 0:
+                    break  # a child we haven't tried: simulate from here
+
+            result = self.simulate(state)
+            for undo in reversed(path):
+                self.reversi.unmake_move(undo)
+            tree.back_prop(node, result)
+            sim_count += 1
+
+        return tree.child_results(root, size), sim_count
+
+    def get_root(self, game_state):
+        """Find or create the root node for a search from game_state,
+        and drop every node that can no longer be reached from it."""
+        root = self.tree_manager.get_node(game_state)
+
+        # even if this is a "recycled" node we've already used,
+        # remove its parent as it is now considered our root level node
+        root.parent = None
+        self.tree_manager.prune(root)
+        return root
+
+    def search_once(self, root, game_state):
+        """Run one select, expand, simulate and back prop iteration,
+        timing each phase into this thread's SearchStats."""
+        stats = self.current_stats()
+        expansion_before = stats.expansion_time
+        start = time.perf_counter()
+
+        # pick move to simulate with UCT
+        path = []
+        with self.tree_lock:
+            picked_node, state = self.tree_policy(root, game_state, path)
+        selected = time.perf_counter()
+
+        # run the simulation and get the result
+        result = self.simulate(state)
+        simulated = time.perf_counter()
+
+        # take back the moves made on the way down the tree
+        for undo in reversed(path):
+            self.reversi.unmake_move(undo)
+
+        # back prop the result of this move up the tree
+        self.back_prop(picked_node, result, self.virtual_loss)
+
+        stats.selection_time += selected - start - (stats.expansion_time - expansion_before)
+        stats.playout_time += simulated - selected
+        stats.backprop_time += time.perf_counter() - simulated
+        stats.total_depth += len(path)
+        if len(path) > stats.max_depth:
+            stats.max_depth = len(path)
+
+    def root_parallel_search(self, game_state):
+        """
+        Root parallelization: each of the worker processes grows its own
+        tree from the given game state until its budget is spent, then the
+        statistics of every root's children are summed.  A sim_count budget
+        is shared out evenly between the workers.
+        Returns the same (results, sim_count) pair as search_tree.
+        """
+        if self.pool is None:
+            worker_args = dict(self.worker_args, size=self.reversi.size,
+                               bitboard=isinstance(self.reversi.board, BitBoard))
+            self.pool = multiprocessing.Pool(
+                self.workers, initializer=init_search_worker,
+                initargs=(self.color, worker_args))
+
+        # every worker needs its own random seed, or forked workers
+        # would all play exactly the same simulations
+        tasks = [(game_state, self.rng.getrandbits(64), share)
+                 for share in split_sim_count(self.sim_count, self.workers)]
+        merged = {}
+        sim_count = 0
+        for results, count in self.pool.map(search_worker, tasks, chunksize=1):
+            sim_count += count
+            for move, (wins, plays) in results.items():
+                total_wins, total_plays = merged.get(move, (0, 0))
+                merged[move] = (total_wins + wins, total_plays + plays)
+        return merged, sim_count
+
+    def best_action(self, results):
+        """
+        Given a dict of move: (wins, plays) for the root's children,
+        returns the best action from this game state.
         In Monte Carlo Tree Search we pick the one that was
         visited the most.  We can break ties by picking
         the state that won the most.
@@ -88,67 +362,103 @@ class MonteCarloAgent(Agent):
         most_plays = -float('inf')
         best_wins = -float('inf')
         best_actions = []
-        for child in node.children:
-            wins, plays = child.get_wins_plays()
+        for move, (wins, plays) in results.items():
             if plays > most_plays:
                 most_plays = plays
-                best_actions = [child.move]
+                best_actions = [move]
                 best_wins = wins
             elif plays == most_plays:
                 # break ties with wins
                 if wins > best_wins:
                     best_wins = wins
-                    best_actions = [child.move]
+                    best_actions = [move]
                 elif wins == best_wins:
-                    best_actions.append(child.move)
+                    best_actions.append(move)
 
-        return random.choice(best_actions)
+        return self.rng.choice(best_actions)
 
     @staticmethod
-    def back_prop(node, delta):
+    def back_prop(node, delta, virtual_loss=0):
         """
         Given a node and a delta value for wins,
-        propagate that information up the tree to the root.
+        propagate that information up the tree to the root,
+        taking back the virtual loss the tree policy added on the way down.
         """
         while node is not None:
-            node.plays += 1
-            node.wins += delta
+            with node.lock:
+                node.plays += 1
+                node.wins += delta
+                node.virtual_loss -= virtual_loss
             node = node.parent
 
-    def tree_policy(self, root):
+    def add_virtual_loss(self, node):
+        if self.virtual_loss:
+            with node.lock:
+                node.virtual_loss += self.virtual_loss
+
+    def make_move(self, game_state, move, path):
+        """Make a move in place, recording its undo record in path."""
+        next_state, undo = self.reversi.make_move(game_state, move)
+        path.append(undo)
+        return next_state
+
+    def tree_policy(self, root, game_state, path):
         """
-        Given a root node, determine which child to visit
-        using Upper Confidence Bound.
+        Given a root node and its game state, determine which child to visit
+        using Upper Confidence Bound, walking down the tree one level per
+        loop.  The moves leading to that child are made on the game state's
+        board and recorded in path.
+        Returns the child node and its game state.
         """
-        # legal moves represent potential children of root node
-        legal_moves = root.legal_moves
-        if not legal_moves:
-            return root
-        elif legal_moves == [None]:
-            #  if player must pass turn
-            next_state = self.reversi.next_state(root.game_state, None)
-            pass_node = self.tree_manager.add_node(next_state, None, root)
-            return pass_node
-
-        elif len(root.children) < len(legal_moves):
-            # we have not yet tried all the children for this node
-            untried = [
-                move for move in legal_moves
-                if move not in root.moves_tried
-            ]
-
-            assert untried
-
-            # we have no information about these nodes at all, so pick randomly
-            move = random.choice(untried)
-            next_state = self.reversi.next_state(root.game_state, move)
-            root.moves_tried.add(move)
-            return self.tree_manager.add_node(next_state, move, root)
-
-        else:
-            # we have tried every child node at least once, so traverse tree
-            # with UCT
-            return self.tree_policy(self.best_child(root))
+        node = root
+        while True:
+            self.add_virtual_loss(node)
+
+            # legal moves represent potential children of the node
+            legal_moves = node.legal_moves
+            if not legal_moves:
+                return node, game_state
+
+            if legal_moves == [None]:
+                #  if player must pass turn
+                game_state = self.make_move(game_state, None, path)
+                if not node.children:
+                    return self.expand(game_state, None, node), game_state
+                node = node.children[0]
+
+            elif len(node.moves_tried) < len(legal_moves):
+                # we have not yet tried all the children for this node
+                untried = [
+                    move for move in legal_moves
+                    if move not in node.moves_tried
+                ]
+
+                # we have no information about these nodes at all, so pick randomly
+                move = self.rng.choice(untried)
+                game_state = self.make_move(game_state, move, path)
+                node.moves_tried.add(move)
+                return self.expand(game_state, move, node), game_state
+
+            else:
+                # we have tried every child node at least once, so traverse tree
+                # with UCT
+                node = self.best_child(node)
+                game_state = self.make_move(game_state, node.move, path)
+
+    def expand(self, game_state, move, parent):
+        """Add a node for game_state, reached from parent by move, to the
+        tree and return it.  The time it takes counts as expansion."""
+        start = time.perf_counter()
+        node = self.tree_manager.add_node(game_state, move, parent)
+        self.add_virtual_loss(node)
+        stats = self.current_stats()
+        stats.nodes_created += 1
+        stats.expansion_time += time.perf_counter() - start
+        return node
+
+    def current_stats(self):
+        """The SearchStats the calling thread should count into."""
+        return getattr(self.local, 'stats', self.stats)
 
     def best_child(self, node):
         """
@@ -156,31 +466,71 @@ class MonteCarloAgent(Agent):
         which child of the input node is the best to
         simulate right now.
         """
-        enemy_turn = (node.game_state[1] != self.color)
-        C = 1  # 'exploration' value
-        values = {}
-        _, parent_plays = node.get_wins_plays()
+        enemy_turn = (node.color != self.color)
+        parent_plays = node.plays + node.virtual_loss
+        assert parent_plays > 0
+        if parent_plays >= len(EXPLORATION):
+            grow_uct_tables(2 * parent_plays)
+        # 'exploration' value C times sqrt(2 * log(parent_plays)), so only
+        # a division by sqrt(plays) is left to do per child
+        exploration = C * EXPLORATION[parent_plays]
+
+        best_value = -float('inf')
+        best_choice = None
         for child in node.children:
-            wins, plays = child.get_wins_plays()
+            wins = child.wins
+            plays = child.plays
             if enemy_turn:
                 # the enemy will play against us, not for us
                 wins = plays - wins
-            assert parent_plays > 0
-            values[child] = (wins / plays) + C * \
-                math.sqrt(2 * math.log(parent_plays) / plays)
+            # count plays still in flight in other threads as losses
+            plays += child.virtual_loss
+            value = wins / plays + exploration * INVERSE_SQRT[plays]
+            if value > best_value:
+                best_value = value
+                best_choice = child
 
-        best_choice = max(values, key=values.get)
         return best_choice
 
+    def selections_per_second(self, game_state, seconds=1.0):
+        """
+        Micro-benchmark of UCT selection.  Grows a tree from game_state
+        with this agent's usual budget, then repeatedly walks down it with
+        best_child until reaching a node that isn't fully expanded.
+        Nothing is expanded, simulated or played on the board, so only
+        selection is timed.  Returns best_child calls per second.
+        """
+        self.search_tree(game_state)
+        root = self.tree_manager.get_node(game_state)
+        selections = 0
+        start = time.time()
+        while time.time() - start < seconds:
+            node = root
+            while node.children and len(node.moves_tried) == len(node.legal_moves):
+                node = self.best_child(node)
+                selections += 1
+        return selections / (time.time() - start)
+
     def simulate(self, game_state):
         """
         Starting from the given game state, simulate
         a random game to completion, and return the profit value
-        (1 for a win, 0 for a loss)
+        (1 for a win, 0 for a loss).  The moves are unmade again
+        afterwards, so the game state is left as it was found.
         """
         WIN_PRIZE = 1
         LOSS_PRIZE = 0
-        state = copy.deepcopy(game_state)
+        if isinstance(game_state[0], BitBoard):
+            # the compiled kernel plays the whole game without the GIL
+            diff = random_playout(game_state[0], game_state[1],
+                                  self.rng.getrandbits(64))
+            if game_state[1] != self.color:
+                diff = -diff
+            # we don't want to tie, we want to win!
+            return WIN_PRIZE if diff > 0 else LOSS_PRIZE
+
+        state = game_state
+        undo_stack = []
         while True:
             board = state[0]
             winner = self.reversi.winner(board)
@@ -188,13 +538,14 @@ class MonteCarloAgent(Agent):
                 black_count, white_count = board.get_stone_counts()
                 if black_count == white_count:
                     # we don't want to tie, we want to win!
-                    return LOSS_PRIZE
+                    result = LOSS_PRIZE
                 elif winner == self.color:
-                    return WIN_PRIZE
+                    result = WIN_PRIZE
                 elif winner == opponent[self.color]:
-                    return LOSS_PRIZE
+                    result = LOSS_PRIZE
                 else:
                     raise ValueError
+                break
 
             moves = self.reversi.legal_moves(state)
             if not moves:
@@ -202,46 +553,156 @@ class MonteCarloAgent(Agent):
                 state = (state[0], opponent[state[1]])
                 moves = self.reversi.legal_moves(state)
 
-            picked = random.choice(moves)
-            state = self.reversi.apply_move(state, picked)
+            picked = self.rng.choice(moves)
+            state, undo = self.reversi.make_move(state, picked)
+            undo_stack.append(undo)
+
+        for undo in reversed(undo_stack):
+            self.reversi.unmake_move(undo)
+        return result
+
+
+# the agent a root-parallel worker process searches with
+worker_agent = None
+
+# options not passed on to worker processes: their game needs no agents
+# or gui of its own, and a worker only ever searches with its own tree
+WORKER_EXCLUDED = ('BlackAgent', 'WhiteAgent', 'gui', 'silent', 'workers', 'threads', 'book')
+
+
+def init_search_worker(color, worker_args):
+    """Pool initializer: give this worker process its own game and agent,
+    built with the options of the agent that owns the pool."""
+    global worker_agent
+    # imported here because game.reversi itself imports the agents package
+    from game.reversi import Reversi
+    reversi = Reversi(silent=True, **worker_args)
+    worker_agent = MonteCarloAgent(reversi, color, **worker_args)
+
+
+def search_worker(task):
+    """Pool task: grow this worker's tree from a game state, as a tree of
+    Nodes or an ArrayTree, whichever the owning agent searches with."""
+    game_state, seed, sim_count = task
+    worker_agent.rng = random.Random(seed)
+    worker_agent.sim_count = sim_count
+    if worker_agent.array_tree:
+        return worker_agent.array_tree_search(game_state)
+    return worker_agent.search_tree(game_state)
+
+
+def split_sim_count(sim_count, parts):
+    """Share a sim_count budget out between parts searchers.  Without a
+    sim_count every searcher runs on the clock, so each gets None."""
+    if sim_count is None:
+        return [None] * parts
+    return [sim_count // parts + (1 if i < sim_count % parts else 0)
+            for i in range(parts)]
 
 
 class TreeManager:
 
-    def __init__(self, reversi):
+    def __init__(self, reversi, max_nodes=None):
         self.state_node = {}
         self.reversi = reversi
+        self.max_nodes = max_nodes
+        # every node in the tree; state_node holds one node per state,
+        # so it can be smaller when states are reached by several paths
+        self.node_count = 0
 
     def add_node(self, game_state, move, parent=None):
         legal_moves = self.reversi.legal_moves(game_state)
         is_game_over = self.reversi.winner(game_state[0]) is not False
         if len(legal_moves) == 0 and not is_game_over:
             legal_moves = [None]  # it can only make one move: pass turn
-        n = Node(game_state, move, legal_moves)
+        n = Node(state_key(game_state), game_state[1], move, legal_moves)
         n.parent = parent
         if parent is not None:
             parent.add_child(n)
-        self.state_node[game_state] = n
+        self.state_node[n.key] = n
+        self.node_count += 1
         return n
 
+    def prune(self, root):
+        """Forget every node that is not in root's subtree."""
+        self.state_node = {}
+        self.node_count = 0
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            self.state_node[node.key] = node
+            self.node_count += 1
+            stack.extend(node.children)
+
+    def recycle(self, root):
+        """
+        If the tree holds more than max_nodes nodes, drop its least visited
+        leaves, pass after pass, until it is back under RECYCLE_TARGET of
+        max_nodes.  The root's own children are kept, since the move is
+        chosen from them, and so are nodes another thread is simulating from.
+        A dropped move becomes untried again, so it can be expanded afresh
+        later.  Returns the number of nodes dropped.
+        """
+        if self.max_nodes is None or self.node_count <= self.max_nodes:
+            return 0
+
+        target = int(self.max_nodes * RECYCLE_TARGET)
+        total = 0
+        while self.node_count > target:
+            dropped = self.drop_leaves(root, self.node_count - target)
+            if not dropped:
+                break  # nothing left that may be dropped
+            total += dropped
+        return total
+
+    def drop_leaves(self, root, excess):
+        """Drop up to excess of the tree's current leaves, least visited
+        first.  Returns the number dropped."""
+        leaves = []
+        stack = list(root.children)
+        while stack:
+            node = stack.pop()
+            if node.children:
+                stack.extend(node.children)
+            elif node.parent is not root and not node.virtual_loss:
+                leaves.append(node)
+
+        leaves.sort(key=lambda leaf: leaf.plays)
+        dropped = leaves[:excess]
+        for leaf in dropped:
+            parent = leaf.parent
+            parent.children.remove(leaf)
+            parent.moves_tried.discard(leaf.move)
+            leaf.parent = None
+            if self.state_node.get(leaf.key) is leaf:
+                del self.state_node[leaf.key]
+        self.node_count -= len(dropped)
+        return len(dropped)
+
     def get_node(self, game_state):
         """
         Get the existing Node for this game_state.
         Creates one if it does not yet exist.
         """
-        if game_state in self.state_node:
-            return self.state_node[game_state]
+        key = state_key(game_state)
+        if key in self.state_node:
+            return self.state_node[key]
         else:
             return self.add_node(game_state, None)
 
 
 class Node:
 
-    def __init__(self, game_state, move, legal_moves):
-        self.game_state = game_state
+    def __init__(self, key, color, move, legal_moves):
+        # nodes don't hold a board; the search makes and unmakes
+        # moves on a single board as it walks the tree
+        self.key = key  # state_key() of this node's game state
+        self.color = color  # whose turn it is at this node
 
         self.plays = 0
         self.wins = 0
+        self.virtual_loss = 0  # plays in flight, added by tree parallelization
+        self.lock = threading.Lock()  # guards the statistics
 
         self.children = []  # child Nodes
         self.parent = None
@@ -265,7 +726,7 @@ class Node:
         return self.wins, self.plays
 
     def __hash__(self):
-        return hash(self.game_state)
+        return hash(self.key)
 
     def __repr__(self):
         return 'move: {} wins: {} plays: {}'.format(self.move, self.wins, self.plays)
@@ -273,4 +734,4 @@ class Node:
     def __eq__(self, other):
         if not isinstance(other, Node):
             return False
-        return self.game_state == other.game_state
+        return self.key == other.key
@@ -1,16 +1,19 @@
 """This Q-Learning neural network agent is still a work in progress and is not complete yet."""
+import os
 import random
+import time
 from agents import Agent
 from keras.layers import Dense
 from keras.models import Sequential, model_from_json
 from keras.optimizers import RMSprop, SGD
-from util import info, opponent, color_name, numpify, best_move_val
+from util import info, opponent, color_name, numpify, numpify_states, best_move_val, ReplayMemory
 
 MODEL_FILENAME = 'neural/q_model'
 WEIGHTS_FILENAME = 'neural/q_weights'
 HIDDEN_SIZE = 42
 ALPHA = 1.0
 BATCH_SIZE = 64
+MEMORY_SIZE = 100000
 
 WIN_REWARD = 1
 LOSE_REWARD = -1
@@ -26,6 +29,7 @@ class QLearningAgent(Agent):
         self.learning_enabled = kwargs.get('learning_enabled', False)
         self.model = self.get_model(kwargs.get('model_file', None))
         self.minimax_enabled = kwargs.get('minimax', False)
+        self.leaves_evaluated = 0
 
         weights_num = kwargs.get('weights_num', '')
         self.load_weights(weights_num)
@@ -35,7 +39,7 @@ class QLearningAgent(Agent):
         if self.learning_enabled:
             self.epoch = 0
             self.train_count = random.choice(range(BATCH_SIZE))
-            self.memory = None
+            self.memory = ReplayMemory(kwargs.get('memory_size', MEMORY_SIZE), reversi.size)
             self.prev_move = None
             self.prev_state = None
 
@@ -75,26 +79,19 @@ class QLearningAgent(Agent):
             return move
 
     def minimax(self, state, depth=2, alpha=-float('inf'), beta=float('inf')):
-        # pdb.set_trace()
-        """Given a state, find its minimax value."""
+        """Given a state, find its minimax value.  Leaves are evaluated by
+        the model in batches: all the children of a node one ply above the
+        leaves go through a single predict call (see frontier_value)."""
         assert state[1] == self.color or state[1] == opponent[self.color]
-        player_turn = True if state[1] == self.color else False
+        state, legal, winner = self.settle(state)
+        if winner is not False:
+            return self.terminal_value(winner)
+        elif depth == 0:
+            return self.evaluate_leaves([(state, legal)])[0]
 
-        legal = self.reversi.legal_moves(state)
-        winner = self.reversi.winner(state)
-        if not legal and winner is False:
-            # no legal moves, but game isn't over, so pass turn
-            return self.minimax(self.reversi.next_state(state, None))
-        elif depth == 0 or winner is not False:
-            if winner == self.color:
-                return 9999999
-            elif winner == opponent[self.color]:
-                return -9999999
-            else:
-                q_vals = self.model.predict(numpify(state))
-                best_move, best_q = best_move_val(q_vals, legal)
-                print('best_q: {}'.format(best_q))
-                return best_q
+        player_turn = True if state[1] == self.color else False
+        if depth == 1:
+            return self.frontier_value(state, legal, player_turn)
 
         if player_turn:
             val = -float('inf')
@@ -115,10 +112,57 @@ class QLearningAgent(Agent):
                     break
             return val
 
+    def settle(self, state):
+        """Pass the turn while the side to move has no legal moves but the
+        game isn't over.  Returns (state, legal moves, winner)."""
+        legal = self.reversi.legal_moves(state)
+        winner = self.reversi.winner(state[0])
+        if not legal and winner is False:
+            state = self.reversi.next_state(state, None)
+            legal = self.reversi.legal_moves(state)
+        return state, legal, winner
+
+    def terminal_value(self, winner):
+        if winner == self.color:
+            return 9999999
+        elif winner == opponent[self.color]:
+            return -9999999
+
+    def frontier_value(self, state, legal, player_turn):
+        """The minimax value of a node whose children are all leaves.  The
+        children that aren't game-over are evaluated in one batch, so
+        alpha-beta cutoffs among them would save nothing."""
+        children = [self.settle(self.reversi.next_state(state, move)) for move in legal]
+        leaves = [(child, child_legal) for child, child_legal, winner in children
+                  if winner is False]
+        values = [self.terminal_value(winner) for _, _, winner in children
+                  if winner is not False]
+        if leaves:
+            values.extend(self.evaluate_leaves(leaves))
+        return max(values) if player_turn else min(values)
+
+    def evaluate_leaves(self, leaves):
+        """Given a list of (state, legal moves) pairs, return the value of
+        each: its best q value over its legal moves.  One predict call
+        covers every leaf."""
+        q_vals = self.model.predict(numpify_states([leaf for leaf, _ in leaves]))
+        self.leaves_evaluated += len(leaves)
+        return [best_move_val(q_vals[i:i + 1], legal)[1]
+                for i, (_, legal) in enumerate(leaves)]
+
+    def leaves_per_second(self, state, seconds=1.0):
+        """Run minimax searches from state for about seconds and return the
+        rate at which leaves were evaluated."""
+        self.leaves_evaluated = 0
+        start = time.time()
+        while time.time() - start < seconds:
+            self.minimax(state)
+        return self.leaves_evaluated / (time.time() - start)
+
     def observe_win(self, state):
         """Called by the game at end of game to present the agent with the final board state."""
         if self.learning_enabled:
-            winner = self.reversi.winner(state)
+            winner = self.reversi.winner(state[0])
             self.train(state, [], winner)
 
     def reset(self):
@@ -212,6 +256,7 @@ class QLearningAgent(Agent):
     def save_model(model):
         """Given a model, save it to disk."""
         as_json = model.to_json()
+        os.makedirs(os.path.dirname(MODEL_FILENAME), exist_ok=True)
         with open(MODEL_FILENAME, 'w') as f:
             f.write(as_json)
             print('model saved to {}'.format(MODEL_FILENAME))
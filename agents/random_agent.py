@@ -9,11 +9,12 @@ class RandomAgent(Agent):
     def __init__(self, reversi, color, **kwargs):
         self.reversi = reversi
         self.color = color
+        self.rng = random.Random(kwargs.get('seed', None))
 
     def get_action(self, state, legal_moves):
         if not legal_moves:
             return None
-        return random.choice(legal_moves)
+        return self.rng.choice(legal_moves)
 
     def reset(self):
         pass
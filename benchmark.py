@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+import json
+import os
+import random
+import sys
+import time
+from copy import deepcopy
+from sys import argv
+from game.reversi import Reversi
+from agents import MonteCarloAgent
+from util import prop_parse, BLACK
+
+# the stored results new runs are compared with, one entry per engine
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+# a result this fraction slower than the baseline counts as a regression
+DEFAULT_THRESHOLD = 0.1
+
+# simulations per search in the mcts benchmark
+MCTS_SIMS = 200
+
+
+def position_set(reversi, games=20, seed=0):
+    """Every position of a fixed set of random games, as game states
+    holding their own copies of the board."""
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(games):
+        state = deepcopy(reversi.get_state())
+        while reversi.winner(state[0]) is False:
+            positions.append(deepcopy(state))
+            moves = reversi.legal_moves(state)
+            state = reversi.apply_move(state, rng.choice(moves) if moves else None)
+    return positions
+
+
+def measure(work, seconds, repeat):
+    """Call work, which returns how many operations it did, until seconds
+    have passed.  Returns the best operations per second of repeat runs."""
+    best = 0.0
+    for _ in range(repeat):
+        count = 0
+        start = time.time()
+        while time.time() - start < seconds:
+            count += work()
+        best = max(best, count / (time.time() - start))
+    return best
+
+
+def bench_legal_moves(reversi, positions, seconds, repeat):
+    def work():
+        # time move generation, not cache lookups
+        reversi.legal_cache.clear()
+        for state in positions:
+            reversi.legal_moves(state)
+        return len(positions)
+    return measure(work, seconds, repeat)
+
+
+def bench_apply_move(reversi, positions, seconds, repeat):
+    """Moves made and unmade per second, over every legal move of every
+    position."""
+    pairs = [(state, move) for state in positions for move in reversi.legal_moves(state)]
+
+    def work():
+        for state, move in pairs:
+            _, undo = reversi.make_move(state, move)
+            reversi.unmake_move(undo)
+        return len(pairs)
+    return measure(work, seconds, repeat)
+
+
+def bench_playouts(reversi, seconds, repeat):
+    agent = MonteCarloAgent(reversi, BLACK, seed=0)
+    state = reversi.get_state()
+
+    def work():
+        agent.simulate(state)
+        return 1
+    return measure(work, seconds, repeat)
+
+
+def bench_mcts(reversi, seconds, repeat):
+    agent = MonteCarloAgent(reversi, BLACK, sim_count=MCTS_SIMS, seed=0)
+    state = reversi.get_state()
+
+    def work():
+        agent.reset()
+        return agent.search_tree(state)[1]
+    return measure(work, seconds, repeat)
+
+
+def bench_games(reversi, seconds, repeat):
+    def work():
+        reversi.play_game()
+        return 1
+    return measure(work, seconds, repeat)
+
+
+def bench_q_minimax(reversi, seconds, repeat):
+    """Leaves evaluated per second by QLearningAgent's minimax search,
+    with a fresh untrained model."""
+    # imported here so the other benchmarks don't need keras
+    from agents.q_learning_agent import QLearningAgent
+    agent = QLearningAgent(reversi, BLACK, minimax=True)
+    state = reversi.get_state()
+    return max(agent.leaves_per_second(state, seconds) for _ in range(repeat))
+
+
+def run_benchmarks(bitboard=False, seconds=1.0, repeat=3, q_learning=False):
+    """Run every benchmark on one engine.  Returns a dict of name: rate."""
+    # random agents on both sides, for the games benchmark
+    reversi = Reversi(bitboard=bitboard, silent=True, seed=0)
+    positions = position_set(reversi)
+    results = {
+        'legal_moves_per_s': bench_legal_moves(reversi, positions, seconds, repeat),
+        'apply_move_per_s': bench_apply_move(reversi, positions, seconds, repeat),
+        'playouts_per_s': bench_playouts(reversi, seconds, repeat),
+        'mcts_sims_per_s': bench_mcts(reversi, seconds, repeat),
+        'games_per_s': bench_games(reversi, seconds, repeat),
+    }
+    if q_learning:
+        results['q_minimax_leaves_per_s'] = bench_q_minimax(reversi, seconds, repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print each result against its baseline.  Returns the names of the
+    results more than threshold slower than their baseline."""
+    regressions = []
+    for name, rate in results.items():
+        if name not in baseline:
+            print('  {}: {:.1f} (no baseline)'.format(name, rate))
+            continue
+        change = rate / baseline[name] - 1
+        flag = ''
+        if change < -threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('  {}: {:.1f} (baseline {:.1f}, {:+.1%}){}'.format(
+            name, rate, baseline[name], change, flag))
+    return regressions
+
+
+def main(**kwargs):
+
+    input_args = prop_parse(argv)
+    input_args.update(kwargs)
+
+    if '-h' in argv or '--help' in argv:
+        print('optional inputs:')
+        print('  bitboard=(True/False, benchmark the 64-bit mask engine)')
+        print('  seconds=(time per benchmark run), repeat=(runs, best is kept)')
+        print('  q_learning=(True/False, also time QLearningAgent minimax; needs keras)')
+        print('  out=(write the results to this JSON file too)')
+        print('  baseline=(JSON file of stored results, default {})'.format(DEFAULT_BASELINE))
+        print('  threshold=(slowdown that fails, default {})'.format(DEFAULT_THRESHOLD))
+        print('  save_baseline=(True/False, store these results as the baseline)')
+        print('baselines are machine-specific, so record one on the machine that runs the checks.')
+        quit()
+
+    engine = 'bitboard' if input_args.get('bitboard', False) else 'list'
+    results = run_benchmarks(input_args.get('bitboard', False),
+                             input_args.get('seconds', 1.0), input_args.get('repeat', 3),
+                             input_args.get('q_learning', False))
+    report = {'engine': engine, 'results': results}
+    print(json.dumps(report, indent=2))
+    if 'out' in input_args:
+        with open(input_args['out'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+    baseline_path = input_args.get('baseline', DEFAULT_BASELINE)
+    baselines = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baselines = json.load(f)
+
+    if input_args.get('save_baseline', False):
+        baselines[engine] = results
+        with open(baseline_path, 'w') as f:
+            json.dump(baselines, f, indent=2)
+        print('saved {} baseline to {}'.format(engine, baseline_path))
+    elif engine in baselines:
+        print('compared with {} baseline in {}:'.format(engine, baseline_path))
+        regressions = compare(results, baselines[engine],
+                              input_args.get('threshold', DEFAULT_THRESHOLD))
+        if regressions:
+            print('regressions: {}'.format(', '.join(regressions)))
+            sys.exit(1)
+        print('no regressions.')
+    else:
+        print('no {} baseline in {}; use save_baseline=True to store one.'.format(
+            engine, baseline_path))
+
+
+if __name__ == '__main__':
+    main()
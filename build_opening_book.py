@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+from sys import argv
+from game.reversi import Reversi
+from game.opening_book import build_book
+from run_game import prop_names
+from util import prop_parse
+
+
+def main(**kwargs):
+
+    input_args = prop_parse(argv)
+    input_args.update(kwargs)
+
+    if 'out' not in input_args:
+        print('necessary inputs:')
+        print('  out=(path of the .npy book file to write)')
+        print('optional inputs:')
+        print('  games=(#self-play games), plies=(opening moves kept from each game)')
+        print('  BlackAgent=, WhiteAgent=, (default monte_carlo)')
+        print('  any other run_game.py input, such as sim_time, bitboard or seed')
+        quit()
+
+    input_args.setdefault('BlackAgent', 'monte_carlo')
+    input_args.setdefault('WhiteAgent', 'monte_carlo')
+    input_args.setdefault('sim_time', 1)
+    input_args.setdefault('silent', True)
+    for k, v in input_args.items():
+        if v in prop_names:
+            input_args[k] = prop_names[v]
+
+    reversi = Reversi(**input_args)
+    builder = build_book(reversi, input_args['out'],
+                         input_args.get('games', 100), input_args.get('plies', 12))
+    reversi.close()
+    print('wrote {} positions and moves to {}'.format(
+        len(builder.stats), input_args['out']))
+
+
+if __name__ == '__main__':
+    main()
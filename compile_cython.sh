@@ -1,6 +1,10 @@
 echo 'compiling with cython...';
-cython -3 game/reversi.pyx -o game/reversi.c;
-cython -3 game/board.pyx -o game/board.c;
+cython -3 -I . --module-name game.reversi game/reversi.pyx -o game/reversi.c;
+cython -3 -I . --module-name game.board game/board.pyx -o game/board.c;
+cython -3 -I . --module-name game.bitboard game/bitboard.pyx -o game/bitboard.c;
+cython -3 -I . --module-name game.playout game/playout.pyx -o game/playout.c;
+cython -3 -I . --module-name game.endgame game/endgame.pyx -o game/endgame.c;
+cython -3 -I . --module-name game.symmetry game/symmetry.pyx -o game/symmetry.c;
 
 echo 'removing old .so files...';
 rm *.so agents/*.so game/*.so;
@@ -8,6 +12,10 @@ rm *.so agents/*.so game/*.so;
 echo 'compiling .c files with gcc...'
 gcc -shared `python3-config --includes` -fPIC `python3-config --ldflags` -pthread -fwrapv -O3 -Wall -fno-strict-aliasing game/reversi.c -o game/reversi.so;
 gcc -shared `python3-config --includes` -fPIC `python3-config --ldflags` -pthread -fwrapv -O3 -Wall -fno-strict-aliasing game/board.c -o game/board.so; 
+gcc -shared `python3-config --includes` -fPIC `python3-config --ldflags` -pthread -fwrapv -O3 -Wall -fno-strict-aliasing game/bitboard.c -o game/bitboard.so;
+gcc -shared `python3-config --includes` -fPIC `python3-config --ldflags` -pthread -fwrapv -O3 -Wall -fno-strict-aliasing game/playout.c -o game/playout.so;
+gcc -shared `python3-config --includes` -fPIC `python3-config --ldflags` -pthread -fwrapv -O3 -Wall -fno-strict-aliasing game/endgame.c -o game/endgame.so;
+gcc -shared `python3-config --includes` -fPIC `python3-config --ldflags` -pthread -fwrapv -O3 -Wall -fno-strict-aliasing game/symmetry.c -o game/symmetry.so;
 
 echo 'removing .c files...';
 rm *.c agents/*.c game/*.c;
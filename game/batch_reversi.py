@@ -0,0 +1,165 @@
+import numpy as np
+from util import BLACK, WHITE, EMPTY
+
+# the same square numbering as BitBoard: bit y * 8 + x is square x,y
+START_BLACK = (1 << 27) | (1 << 36)
+START_WHITE = (1 << 28) | (1 << 35)
+
+NOT_A_FILE = np.uint64(0xfefefefefefefefe)  # every square but x == 0
+NOT_H_FILE = np.uint64(0x7f7f7f7f7f7f7f7f)  # every square but x == 7
+NO_MASK = np.uint64(0xffffffffffffffff)
+
+# (shift amount, shifts left?, mask applied after the shift) for each direction
+DIRECTIONS = [
+    (np.uint64(1), True, NOT_A_FILE),   # x + 1
+    (np.uint64(1), False, NOT_H_FILE),  # x - 1
+    (np.uint64(8), True, NO_MASK),      # y + 1
+    (np.uint64(8), False, NO_MASK),     # y - 1
+    (np.uint64(9), True, NOT_A_FILE),   # x + 1, y + 1
+    (np.uint64(7), True, NOT_H_FILE),   # x - 1, y + 1
+    (np.uint64(7), False, NOT_A_FILE),  # x + 1, y - 1
+    (np.uint64(9), False, NOT_H_FILE),  # x - 1, y - 1
+]
+
+SQUARE_BITS = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+
+
+def shift(masks, direction):
+    amount, left, edge = DIRECTIONS[direction]
+    if left:
+        return (masks << amount) & edge
+    return (masks >> amount) & edge
+
+
+def move_masks(own, opp):
+    """For arrays of own and opponent masks, return the mask of legal
+    moves for the owner of each element."""
+    empty = ~(own | opp)
+    moves = np.zeros_like(own)
+    for d in range(8):
+        run = shift(own, d) & opp
+        for _ in range(5):
+            run |= shift(run, d) & opp
+        moves |= shift(run, d) & empty
+    return moves
+
+
+def flip_masks(own, opp, move_bits):
+    """Return the stones flipped when each owner plays the single square set
+    in move_bits.  Elements whose move_bits are zero flip nothing."""
+    flips = np.zeros_like(own)
+    for d in range(8):
+        run = shift(move_bits, d) & opp
+        for _ in range(5):
+            run |= shift(run, d) & opp
+        capped = (shift(run, d) & own) != 0
+        flips |= np.where(capped, run, np.uint64(0))
+    return flips
+
+
+def popcounts(masks):
+    """Number of set bits in each mask."""
+    as_bytes = masks.view(np.uint8).reshape(masks.shape + (8,))
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+def to_cells(black, white, dtype=np.float32):
+    """Expand arrays of masks into arrays of 64 cells in Board's encoding
+    (BLACK, WHITE or EMPTY), indexed y * 8 + x like Board.board[y][x]."""
+    cells = np.full(black.shape + (64,), EMPTY, dtype=dtype)
+    cells[(black[..., None] & SQUARE_BITS) != 0] = BLACK
+    cells[(white[..., None] & SQUARE_BITS) != 0] = WHITE
+    return cells
+
+
+class BatchReversi:
+    """Many 8x8 games of random play held in NumPy arrays of 64-bit masks.
+    Each step() advances every unfinished game by one ply at once, so the
+    cost scales with the vector width rather than with the number of games."""
+
+    def __init__(self, amount, seed=None):
+        self.amount = amount
+        self.black = np.full(amount, START_BLACK, dtype=np.uint64)
+        self.white = np.full(amount, START_WHITE, dtype=np.uint64)
+        self.black_to_move = np.ones(amount, dtype=bool)
+        self.done = np.zeros(amount, dtype=bool)
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_state(cls, game_state, amount, seed=None):
+        """Start amount copies of the game from a BitBoard game_state."""
+        board, color = game_state
+        games = cls(amount, seed)
+        games.black[:] = board.black
+        games.white[:] = board.white
+        games.black_to_move[:] = color == BLACK
+        return games
+
+    def masks(self):
+        """Return the (own, opponent) masks from each side to move's view."""
+        own = np.where(self.black_to_move, self.black, self.white)
+        opp = np.where(self.black_to_move, self.white, self.black)
+        return own, opp
+
+    def legal_move_masks(self):
+        own, opp = self.masks()
+        return move_masks(own, opp)
+
+    def random_moves(self, moves):
+        """Pick one set bit of each non-zero mask uniformly at random.
+        Returns a mask holding just that bit (zero where moves is zero)."""
+        legal = (moves[:, None] & SQUARE_BITS) != 0
+        weights = np.where(legal, self.rng.random(legal.shape), -1.0)
+        picked = SQUARE_BITS[np.argmax(weights, axis=1)]
+        return np.where(moves != 0, picked, np.uint64(0))
+
+    def step(self):
+        """Advance every unfinished game by one ply.  A side with no legal
+        move passes; a game ends when neither side can move."""
+        own, opp = self.masks()
+        moves = move_masks(own, opp)
+        self.done |= (moves == 0) & (move_masks(opp, own) == 0)
+        moves[self.done] = 0
+
+        move_bits = self.random_moves(moves)
+        flips = flip_masks(own, opp, move_bits)
+        own |= flips | move_bits
+        opp &= ~flips
+
+        self.black = np.where(self.black_to_move, own, opp)
+        self.white = np.where(self.black_to_move, opp, own)
+        self.black_to_move ^= ~self.done
+
+    def play(self):
+        """Play every game to completion.  Returns (history, lengths):
+        history has shape (plies, amount, 64) and holds each game's board
+        before every ply plus its final board, in Board's cell encoding.
+        A game's rows past lengths[i] repeat its final board."""
+        black_history = [self.black]
+        white_history = [self.white]
+        lengths = np.ones(self.amount, dtype=np.int64)
+        while True:
+            self.step()
+            if self.done.all():
+                break
+            lengths += ~self.done
+            black_history.append(self.black)
+            white_history.append(self.white)
+        return to_cells(np.stack(black_history), np.stack(white_history)), lengths
+
+    def stone_counts(self):
+        """Return arrays of (black, white) stone counts."""
+        return popcounts(self.black), popcounts(self.white)
+
+    def winners(self):
+        """Return each finished game's winner, using the same rule as
+        Reversi.winner: black wins ties."""
+        black_count, white_count = self.stone_counts()
+        return np.where(black_count >= white_count, BLACK, WHITE)
+
+
+def game_boards(history, lengths):
+    """Flatten a (history, lengths) pair from BatchReversi.play into one
+    (boards, 64) array holding only the real boards, game by game."""
+    plies = np.arange(history.shape[0])[None, :] < lengths[:, None]
+    return history.transpose(1, 0, 2)[plies]
@@ -0,0 +1,6 @@
+# C-level functions of the bitboard engine shared with other modules, so
+# that there is only one copy of the 8x8 Zobrist tables and every engine
+# and symmetry helper keys positions the same way.
+from libc.stdint cimport uint64_t
+
+cdef uint64_t mask_zobrist(uint64_t black, uint64_t white) nogil
@@ -0,0 +1,233 @@
+from libc.stdint cimport uint64_t
+from game.bitops cimport popcount, lowest_square, move_mask, flip_mask
+from game.board import Board, zobrist_keys
+from util import *
+
+FULL_BOARD = 0xffffffffffffffff
+
+# the same Zobrist keys a list-based 8x8 Board uses, so both engines
+# produce identical keys for identical positions
+cdef uint64_t BLACK_KEYS[64]
+cdef uint64_t WHITE_KEYS[64]
+cdef int _square
+for _square in range(64):
+    BLACK_KEYS[_square] = zobrist_keys(8)[BLACK][_square]
+    WHITE_KEYS[_square] = zobrist_keys(8)[WHITE][_square]
+
+
+cdef uint64_t mask_zobrist(uint64_t black, uint64_t white) nogil:
+    """Compute the Zobrist key of a position from scratch.  Declared in
+    bitboard.pxd, so that game.symmetry keys positions with these tables."""
+    cdef uint64_t key = 0
+    cdef int square
+    while black:
+        square = lowest_square(black)
+        key ^= BLACK_KEYS[square]
+        black &= black - 1
+    while white:
+        square = lowest_square(white)
+        key ^= WHITE_KEYS[square]
+        white &= white - 1
+    return key
+
+
+cdef list mask_to_moves(uint64_t mask):
+    """Convert a move mask into a list of x,y positions, in the same
+    row-by-row order the list-based Board search produces."""
+    cdef int square
+    moves = []
+    while mask:
+        square = lowest_square(mask)
+        moves.append((square & 7, square >> 3))
+        mask &= mask - 1
+    return moves
+
+
+cdef uint64_t flips_zobrist(uint64_t flips):
+    """The change in Zobrist key when the stones in flips change color."""
+    cdef uint64_t key = 0
+    cdef int square
+    while flips:
+        square = lowest_square(flips)
+        key ^= BLACK_KEYS[square] ^ WHITE_KEYS[square]
+        flips &= flips - 1
+    return key
+
+
+class BitBoard(Board):
+    """An 8x8 Board stored as two 64-bit occupancy masks, one per color.
+    Bit y * 8 + x of a mask is set when that color has a stone at x,y.
+    Move generation and flipping are done with shifts and masks instead
+    of walking the squares one by one."""
+
+    def __init__(self, size_t size=8):
+        assert size == 8, 'BitBoard only supports 8x8 boards'
+        self.size = size
+        self.black = 0
+        self.white = 0
+        self.zobrist = 0
+        self.init_starting_position()
+
+    @classmethod
+    def from_board(cls, board):
+        """Build a BitBoard holding the same position as any other Board."""
+        result = cls(board.get_size())
+        result.black = 0
+        result.white = 0
+        result.zobrist = 0
+        for y in range(board.get_size()):
+            for x in range(board.get_size()):
+                piece = board.piece_at(x, y)
+                if piece != EMPTY:
+                    result.place_stone_at(piece, x, y)
+        return result
+
+    def init_starting_position(self):
+        self.black = (1 << 27) | (1 << 36)  # 3,3 and 4,4
+        self.white = (1 << 28) | (1 << 35)  # 4,3 and 3,4
+        self.zobrist = mask_zobrist(self.black, self.white)
+
+    def masks(self, color):
+        """Return the (own, opponent) masks from color's point of view."""
+        if color == BLACK:
+            return self.black, self.white
+        return self.white, self.black
+
+    def place_stone_at(self, color, int x, int y):
+        cdef int square = y * 8 + x
+        bit = (<uint64_t>1) << square
+        # take out the old stone, if any, then put in the new one;
+        # EMPTY leaves the square empty, as on a list-based Board
+        if self.black & bit:
+            self.zobrist ^= BLACK_KEYS[square]
+        elif self.white & bit:
+            self.zobrist ^= WHITE_KEYS[square]
+        self.black &= ~bit
+        self.white &= ~bit
+
+        if color == BLACK:
+            self.black |= bit
+            self.zobrist ^= BLACK_KEYS[square]
+        elif color == WHITE:
+            self.white |= bit
+            self.zobrist ^= WHITE_KEYS[square]
+
+    def remove_stone_at(self, int x, int y):
+        cdef int square = y * 8 + x
+        bit = (<uint64_t>1) << square
+        if self.black & bit:
+            self.black ^= bit
+            self.zobrist ^= BLACK_KEYS[square]
+        elif self.white & bit:
+            self.white ^= bit
+            self.zobrist ^= WHITE_KEYS[square]
+        else:
+            raise TypeError
+
+    def flip_stone(self, int x, int y):
+        cdef int square = y * 8 + x
+        bit = (<uint64_t>1) << square
+        if self.black & bit or self.white & bit:
+            self.black ^= bit
+            self.white ^= bit
+            self.zobrist ^= BLACK_KEYS[square] ^ WHITE_KEYS[square]
+        else:
+            raise TypeError
+
+    def piece_at(self, int x, int y):
+        bit = (<uint64_t>1) << (y * 8 + x)
+        if self.black & bit:
+            return BLACK
+        elif self.white & bit:
+            return WHITE
+        return EMPTY
+
+    @property
+    def black_stones(self):
+        return popcount(self.black)
+
+    @property
+    def white_stones(self):
+        return popcount(self.white)
+
+    def get_stone_counts(self):
+        return popcount(self.black), popcount(self.white)
+
+    def is_full(self):
+        return self.black | self.white == FULL_BOARD
+
+    def get_board(self):
+        """Return the position as the list of lists a Board would hold.
+        This is built on every call, so avoid it in hot loops."""
+        return [[self.piece_at(x, y) for x in range(8)] for y in range(8)]
+
+    @property
+    def board(self):
+        return self.get_board()
+
+    def legal_moves(self, color):
+        """Return the list of x,y positions where color may play."""
+        own, opp = self.masks(color)
+        return mask_to_moves(move_mask(own, opp))
+
+    def has_moves(self, color):
+        own, opp = self.masks(color)
+        return move_mask(own, opp) != 0
+
+    def is_legal(self, color, int x, int y):
+        own, opp = self.masks(color)
+        return (move_mask(own, opp) >> (y * 8 + x)) & 1 == 1
+
+    def play(self, color, int x, int y):
+        """Place a stone for color at x,y and flip every stone it captures.
+        Assumes the move is legal.  Returns the mask of flipped stones."""
+        cdef int square = y * 8 + x
+        cdef uint64_t own, opp, flips
+        cdef uint64_t key = self.zobrist
+        own, opp = self.masks(color)
+        flips = flip_mask(own, opp, square)
+        own |= flips | ((<uint64_t>1) << square)
+        opp &= ~flips
+        if color == BLACK:
+            self.black, self.white = own, opp
+            key ^= BLACK_KEYS[square]
+        else:
+            self.white, self.black = own, opp
+            key ^= WHITE_KEYS[square]
+        self.zobrist = key ^ flips_zobrist(flips)
+        return flips
+
+    def unplay(self, color, int x, int y, uint64_t flips):
+        """Take back a play() by color at x,y that flipped the given mask."""
+        cdef int square = y * 8 + x
+        cdef uint64_t own, opp
+        cdef uint64_t key = self.zobrist
+        own, opp = self.masks(color)
+        own &= ~(flips | ((<uint64_t>1) << square))
+        opp |= flips
+        if color == BLACK:
+            self.black, self.white = own, opp
+            key ^= BLACK_KEYS[square]
+        else:
+            self.white, self.black = own, opp
+            key ^= WHITE_KEYS[square]
+        self.zobrist = key ^ flips_zobrist(flips)
+
+    def __copy__(self):
+        result = BitBoard.__new__(BitBoard)
+        result.size = self.size
+        result.black = self.black
+        result.white = self.white
+        result.zobrist = self.zobrist
+        return result
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def __hash__(self):
+        return self.zobrist
+
+    def __eq__(self, other):
+        if isinstance(other, BitBoard):
+            return self.black == other.black and self.white == other.white
+        return Board.__eq__(self, other)
@@ -0,0 +1,70 @@
+# Shift-and-mask primitives for the 8x8 bitboard engine.
+# Square index is y * 8 + x, so bit 0 is (0, 0) and bit 63 is (7, 7).
+from libc.stdint cimport uint64_t
+
+cdef extern from *:
+    int __builtin_popcountll(unsigned long long) nogil
+    int __builtin_ctzll(unsigned long long) nogil
+
+
+cdef inline int popcount(uint64_t b) nogil:
+    return __builtin_popcountll(b)
+
+
+cdef inline int lowest_square(uint64_t b) nogil:
+    """Index of the least significant set bit.  b must be non-zero."""
+    return __builtin_ctzll(b)
+
+
+cdef inline uint64_t shift(uint64_t b, int direction) nogil:
+    """Move every stone in b one step in the given direction (0-7).
+    The masks drop stones that would wrap around to the other edge:
+    0xfe.. is every square but x == 0, 0x7f.. every square but x == 7."""
+    if direction == 0:    # x + 1
+        return (b << 1) & 0xfefefefefefefefeULL
+    elif direction == 1:  # x - 1
+        return (b >> 1) & 0x7f7f7f7f7f7f7f7fULL
+    elif direction == 2:  # y + 1
+        return b << 8
+    elif direction == 3:  # y - 1
+        return b >> 8
+    elif direction == 4:  # x + 1, y + 1
+        return (b << 9) & 0xfefefefefefefefeULL
+    elif direction == 5:  # x - 1, y + 1
+        return (b << 7) & 0x7f7f7f7f7f7f7f7fULL
+    elif direction == 6:  # x + 1, y - 1
+        return (b >> 7) & 0xfefefefefefefefeULL
+    else:                 # x - 1, y - 1
+        return (b >> 9) & 0x7f7f7f7f7f7f7f7fULL
+
+
+cdef inline uint64_t move_mask(uint64_t own, uint64_t opp) nogil:
+    """Every empty square where the owner of `own` may legally play."""
+    cdef uint64_t empty = ~(own | opp)
+    cdef uint64_t moves = 0
+    cdef uint64_t run
+    cdef int d, i
+    for d in range(8):
+        # a run of opponent stones adjacent to one of ours...
+        run = shift(own, d) & opp
+        for i in range(5):
+            run |= shift(run, d) & opp
+        # ...capped by an empty square
+        moves |= shift(run, d) & empty
+    return moves
+
+
+cdef inline uint64_t flip_mask(uint64_t own, uint64_t opp, int square) nogil:
+    """The opponent stones flipped when `own` plays at square."""
+    cdef uint64_t flips = 0
+    cdef uint64_t run, cursor
+    cdef int d
+    for d in range(8):
+        run = 0
+        cursor = shift((<uint64_t>1) << square, d)
+        while cursor & opp:
+            run |= cursor
+            cursor = shift(cursor, d)
+        if cursor & own:
+            flips |= run
+    return flips
@@ -1,15 +1,45 @@
+import random
 from util import *
 from cpython cimport bool
 
 WHITE_PIECE = 'O'
 BLACK_PIECE = 'X'
 
+# xor'd into a position's key when it is white's turn to move
+WHITE_TO_MOVE_KEY = 0x9d39247e33776d41
+
+_zobrist_tables = {}
+
+
+def zobrist_keys(size):
+    """Return the Zobrist table for a board size: for each color, one
+    random 64-bit key per square (indexed y * size + x).  The generator
+    is seeded with the size, so keys are the same in every process."""
+    if size not in _zobrist_tables:
+        rand = random.Random(size)
+        _zobrist_tables[size] = {
+            color: [rand.getrandbits(64) for _ in range(size * size)]
+            for color in (BLACK, WHITE)
+        }
+    return _zobrist_tables[size]
+
+
+def state_key(game_state):
+    """Return a 64-bit key for a game_state, covering both the position
+    and whose turn it is.  Unlike the state itself, the key is a snapshot
+    that stays valid after the board is later modified in place."""
+    board, color = game_state
+    if color == WHITE:
+        return board.zobrist ^ WHITE_TO_MOVE_KEY
+    return board.zobrist
+
 class Board:
     def __init__(self, size_t size):
         self.size = size
         assert size >= 4 and size % 2 == 0
         self.black_stones = 0
         self.white_stones = 0
+        self.zobrist = 0
         self.board = [[EMPTY for _ in range(self.size)] for _ in range(self.size)] 
         # self.board = np.zeros((size, size), dtype=np.int8)
         self.init_starting_position()
@@ -30,13 +60,39 @@ class Board:
         self.black_stones = 2
         self.white_stones = 2
 
+        keys = zobrist_keys(self.size)
+        self.zobrist = 0
+        for x, y in ((lower, lower), (higher, higher)):
+            self.zobrist ^= keys[BLACK][y * self.size + x]
+        for x, y in ((lower, higher), (higher, lower)):
+            self.zobrist ^= keys[WHITE][y * self.size + x]
+
     def place_stone_at(self, color, int x, int y):
+        # keep the Zobrist key in step: remove the old stone, add the new one
+        keys = _zobrist_tables[self.size]
+        cdef size_t square = y * self.size + x
+        old = self.board[y][x]
+        if old != EMPTY:
+            self.zobrist ^= keys[old][square]
+        if color != EMPTY:
+            self.zobrist ^= keys[color][square]
+
         self.board[y][x] = color
         if color == WHITE:
             self.white_stones += 1
         elif color == BLACK:
             self.black_stones += 1
 
+    def remove_stone_at(self, int x, int y):
+        piece = self.piece_at(x, y)
+        if piece == WHITE:
+            self.white_stones -= 1
+        elif piece == BLACK:
+            self.black_stones -= 1
+        else:
+            raise TypeError
+        self.place_stone_at(EMPTY, x, y)
+
     def flip_stone(self, int x, int y):
         piece = self.piece_at(x, y)
         if piece == WHITE:
@@ -96,27 +152,14 @@ class Board:
         return self.__str__()
 
     def __hash__(self):
-        # return hash(str(self.board))
-        cdef int hash = 5138
-
-        cdef size_t y, x
-        for y in range(self.size):
-            for x in range(self.size):
-                hash += self.board[y][x]
-                hash += (hash << 10)
-                hash ^= (hash >> 6)
-
-        hash += (hash << 3)
-        hash ^= (hash >> 11)
-        hash += (hash << 15)
-        return hash
+        return self.zobrist
 
     def __eq__(self, other):
+        # differing keys settle almost every comparison without a board scan
+        if self.zobrist != other.zobrist:
+            return False
         if self.black_stones != other.black_stones:
             return False
         if self.white_stones != other.white_stones:
             return False
-        # if self.__hash__() != other.__hash__():
-            # return False
-        # return np.array_equal(self.board, other.board)
         return self.board == other.board
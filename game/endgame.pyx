@@ -0,0 +1,118 @@
+from libc.stdint cimport uint64_t
+from game.bitops cimport popcount, lowest_square, move_mask, flip_mask
+from game.bitboard import BitBoard
+
+# with more empty squares than this, solving takes too long to be worth it
+# in the middle of a game; agents use it as their default threshold
+DEFAULT_EMPTIES = 12
+
+# the four 4x4 quadrants; the empties of a quadrant are its parity region
+cdef uint64_t QUADRANTS[4]
+QUADRANTS[0] = 0x000000000f0f0f0fULL  # x < 4, y < 4
+QUADRANTS[1] = 0x00000000f0f0f0f0ULL  # x >= 4, y < 4
+QUADRANTS[2] = 0x0f0f0f0f00000000ULL  # x < 4, y >= 4
+QUADRANTS[3] = 0xf0f0f0f000000000ULL  # x >= 4, y >= 4
+
+
+cdef inline int quadrant(int square) nogil:
+    return ((square >> 2) & 1) | ((square >> 4) & 2)
+
+
+cdef int order_moves(uint64_t own, uint64_t opp, uint64_t moves, int *squares) nogil:
+    """Write the squares of moves into squares, best-first, and return how
+    many there are.  Fastest-first: a move leaving the opponent fewer
+    replies comes first.  Ties go to a move into a region holding an odd
+    number of empties, so that we, not the opponent, get its last square."""
+    cdef uint64_t empty = ~(own | opp)
+    cdef uint64_t flips, bit
+    cdef int keys[64]
+    cdef int count = 0
+    cdef int square, key, i
+    while moves:
+        square = lowest_square(moves)
+        moves &= moves - 1
+        bit = (<uint64_t>1) << square
+        flips = flip_mask(own, opp, square)
+        key = 2 * popcount(move_mask(opp & ~flips, own | flips | bit))
+        if not popcount(empty & QUADRANTS[quadrant(square)]) & 1:
+            key += 1
+
+        # insertion sort, as there are only a handful of moves
+        i = count
+        while i > 0 and keys[i - 1] > key:
+            keys[i] = keys[i - 1]
+            squares[i] = squares[i - 1]
+            i -= 1
+        keys[i] = key
+        squares[i] = square
+        count += 1
+    return count
+
+
+cdef int search(uint64_t own, uint64_t opp, int alpha, int beta, bint passed) nogil:
+    """Negamax with alpha-beta pruning to the end of the game.  Returns the
+    final disc differential of the side to move, own, with perfect play."""
+    cdef uint64_t moves = move_mask(own, opp)
+    cdef uint64_t flips
+    cdef int squares[64]
+    cdef int count, i, square, score
+    cdef int best = -65
+    if moves == 0:
+        if passed:
+            # neither side can move, so the game is over
+            return popcount(own) - popcount(opp)
+        return -search(opp, own, -beta, -alpha, True)
+
+    count = order_moves(own, opp, moves, squares)
+    for i in range(count):
+        square = squares[i]
+        flips = flip_mask(own, opp, square)
+        score = -search(opp & ~flips, own | flips | ((<uint64_t>1) << square),
+                        -beta, -alpha, False)
+        if score > best:
+            best = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return best
+
+
+def empties(board):
+    """Number of empty squares on any Board."""
+    black_count, white_count = board.get_stone_counts()
+    return board.get_size() ** 2 - black_count - white_count
+
+
+def solve(board, color):
+    """
+    Solve the rest of an 8x8 game exactly, from any Board with color to
+    move.  The board is not modified.  Returns (differential, move):
+    color's final disc count minus its opponent's when both sides play
+    perfectly, and an x,y move that achieves it (None if color must pass).
+    The search runs without holding the GIL.
+    """
+    if not isinstance(board, BitBoard):
+        board = BitBoard.from_board(board)
+    cdef uint64_t own, opp, flips
+    cdef int squares[64]
+    cdef int count, i, square, score
+    cdef int best = -65
+    cdef int best_square = -1
+    own, opp = board.masks(color)
+    with nogil:
+        count = order_moves(own, opp, move_mask(own, opp), squares)
+        if count == 0:
+            best = -search(opp, own, -65, 65, True)
+        for i in range(count):
+            square = squares[i]
+            flips = flip_mask(own, opp, square)
+            score = -search(opp & ~flips, own | flips | ((<uint64_t>1) << square),
+                            -65, -best, False)
+            if score > best:
+                best = score
+                best_square = square
+
+    if best_square == -1:
+        return best, None
+    return best, (best_square & 7, best_square >> 3)
@@ -0,0 +1,134 @@
+import struct
+from game.board import Board
+from game.bitboard import BitBoard
+from game.reversi import Reversi
+from util import BLACK, WHITE
+
+# A record file is a header followed by any number of games, appended one
+# after another, so games can be written as they finish and read back as a
+# stream.  Every ply takes one byte: y * size + x for a move, PASS for a pass.
+#   header: MAGIC, then version and board size as one byte each
+#   game:   ply count (uint16), one byte per ply, then the final black and
+#           white stone counts as one byte each
+MAGIC = b'RVGR'
+VERSION = 1
+PASS = 255
+
+HEADER = struct.Struct('<4sBB')
+PLY_COUNT = struct.Struct('<H')
+RESULT = struct.Struct('<BB')
+
+
+def encode_move(move, size):
+    if move is None:
+        return PASS
+    x, y = move
+    return y * size + x
+
+
+def decode_move(code, size):
+    if code == PASS:
+        return None
+    return code % size, code // size
+
+
+class GameRecord:
+    """One recorded game: its board size, its plies as one-byte codes
+    (see encode_move), and its final stone counts."""
+
+    def __init__(self, size, moves, black_count, white_count):
+        self.size = size
+        self.moves = moves  # bytes
+        self.black_count = black_count
+        self.white_count = white_count
+
+    def plies(self):
+        """The game's moves as x,y positions, or None for passes."""
+        return [decode_move(code, self.size) for code in self.moves]
+
+    def winner(self):
+        """The winner, by the same rule as Reversi.play_game."""
+        return BLACK if self.black_count > self.white_count else WHITE
+
+    def __len__(self):
+        return len(self.moves)
+
+
+class GameWriter:
+    """Appends games to a binary file object opened for writing."""
+
+    def __init__(self, f, size=8):
+        assert size * size <= PASS, 'board too large for one-byte moves'
+        self.f = f
+        self.size = size
+        self.games = 0
+        f.write(HEADER.pack(MAGIC, VERSION, size))
+
+    def write(self, moves, black_count, white_count):
+        """Write one game, given its moves (x,y or None for a pass) in order
+        and its final stone counts."""
+        codes = bytes(encode_move(move, self.size) for move in moves)
+        self.f.write(PLY_COUNT.pack(len(codes)))
+        self.f.write(codes)
+        self.f.write(RESULT.pack(black_count, white_count))
+        self.games += 1
+
+
+def read_games(f):
+    """Yield each GameRecord of a binary file object in turn, reading
+    only as much of the file as the games yielded so far."""
+    magic, version, size = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError('not a game record file')
+    if version != VERSION:
+        raise ValueError('unsupported game record version {}'.format(version))
+    while True:
+        count = f.read(PLY_COUNT.size)
+        if not count:
+            return
+        moves = f.read(PLY_COUNT.unpack(count)[0])
+        black_count, white_count = RESULT.unpack(f.read(RESULT.size))
+        yield GameRecord(size, moves, black_count, white_count)
+
+
+def replay(record, bitboard=None):
+    """
+    Yield the game state before each ply of a recorded game, and then the
+    final one.  Every state shares one board that the next ply changes,
+    so copy a state to keep it.  A BitBoard is used for 8x8 games unless
+    bitboard is False.
+    """
+    if bitboard is None:
+        bitboard = record.size == 8
+    board = BitBoard(record.size) if bitboard else Board(record.size)
+    state = (board, BLACK)
+    yield state
+    for code in record.moves:
+        state = Reversi.apply_move(state, decode_move(code, record.size))
+        yield state
+
+
+def position_at(record, ply, bitboard=None):
+    """Return the game state before ply number ply (from zero) of a recorded
+    game, or the final state if ply == len(record), on a board of its own."""
+    for i, state in enumerate(replay(record, bitboard)):
+        if i == ply:
+            return state
+    raise IndexError('game has only {} plies'.format(len(record)))
+
+
+def play_recorded_game(reversi, writer):
+    """Play one game with reversi's agents, streaming it through
+    Reversi.game_plies, and append it to writer.
+    Returns (winner, white_count, black_count), as play_game does."""
+    moves = []
+    plies = reversi.game_plies()
+    while True:
+        try:
+            color, move, state = next(plies)
+        except StopIteration as game_over:
+            winner, white_count, black_count = game_over.value
+            break
+        moves.append(move)
+    writer.write(moves, black_count, white_count)
+    return winner, white_count, black_count
@@ -0,0 +1,126 @@
+import numpy as np
+from game.symmetry import canonical_key, transform_move, untransform_move
+from util import info, color_name
+
+# one row per (position, move) pair, sorted by key so that all of a
+# position's moves are adjacent and can be found by binary search
+BOOK_DTYPE = np.dtype([
+    ('key', '<u8'),    # canonical_key of the position
+    ('move', 'u1'),    # y * size + x, in the position's canonical image
+    ('wins', '<u4'),   # games won by the side that played the move
+    ('plays', '<u4'),  # games in which the move was played here
+])
+
+# a move needs this many games behind it before the book will play it
+DEFAULT_MIN_PLAYS = 10
+
+
+class OpeningBook:
+    """
+    Move statistics for opening positions, read from a file written by
+    BookBuilder.  The file is memory-mapped rather than loaded, so opening
+    a large book is instant, and processes using the same book share the
+    pages the operating system has cached.  Positions are stored in
+    canonical form, so a book built from one opening also covers the
+    symmetric ones.
+    """
+
+    def __init__(self, path, min_plays=DEFAULT_MIN_PLAYS):
+        self.entries = np.load(path, mmap_mode='r')
+        self.keys = self.entries['key']
+        self.min_plays = min_plays
+
+    def results(self, game_state):
+        """Return the book's moves for game_state as a dict of
+        move: (wins, plays), like MonteCarloAgent's search results."""
+        key, transform = canonical_key(game_state)
+        key = np.uint64(key)
+        start = np.searchsorted(self.keys, key, side='left')
+        end = np.searchsorted(self.keys, key, side='right')
+        size = game_state[0].get_size()
+        results = {}
+        for row in self.entries[start:end]:
+            code = int(row['move'])
+            move = untransform_move((code % size, code // size), transform, size)
+            results[move] = (int(row['wins']), int(row['plays']))
+        return results
+
+    def lookup(self, game_state):
+        """Return the book move for game_state: the one played most often
+        (ties broken by wins), or None if the position isn't in the book
+        or no move has min_plays games behind it."""
+        best_move = None
+        best = (self.min_plays - 1, -1)
+        for move, (wins, plays) in self.results(game_state).items():
+            if (plays, wins) > best:
+                best = (plays, wins)
+                best_move = move
+        return best_move
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class BookBuilder:
+    """Collects (position, move) statistics from finished games and
+    writes them out in the format OpeningBook reads."""
+
+    def __init__(self):
+        self.stats = {}  # (key, move code): [wins, plays]
+
+    def add_game(self, records, winner):
+        """Add one game, given as (key, move code, color) records for
+        the plies to keep and the color of the winner."""
+        for key, code, color in records:
+            counts = self.stats.setdefault((key, code), [0, 0])
+            if color == winner:
+                counts[0] += 1
+            counts[1] += 1
+
+    def entries(self):
+        """Return the statistics as a sorted array of BOOK_DTYPE rows."""
+        entries = np.zeros(len(self.stats), dtype=BOOK_DTYPE)
+        for i, ((key, code), (wins, plays)) in enumerate(sorted(self.stats.items())):
+            entries[i] = (key, code, wins, plays)
+        return entries
+
+    def save(self, path):
+        """Write the book to exactly path; np.save would add '.npy' to a
+        name without it, and the book would then not load from path."""
+        with open(path, 'wb') as f:
+            np.save(f, self.entries())
+
+
+def record_game(reversi, plies):
+    """Play one game between reversi's two agents and return (records,
+    winner), where records holds a (key, move code, color) tuple for each
+    of the first plies moves, in canonical form.  Passes are not recorded."""
+    records = []
+    state = reversi.get_state()
+    ply = 0
+    while reversi.winner(state[0]) is False:
+        picked = reversi.agent_pick_move(state)
+        if picked is not None and ply < plies:
+            key, transform = canonical_key(state)
+            x, y = transform_move(picked, transform, reversi.size)
+            records.append((key, y * reversi.size + x, state[1]))
+        ply += 1
+        state = reversi.apply_move(state, picked)
+
+    reversi.white_agent.observe_win(state)
+    reversi.black_agent.observe_win(state)
+    winner = reversi.winner(state[0])
+    reversi.reset()
+    return records, winner
+
+
+def build_book(reversi, path, games, plies):
+    """Play games games between reversi's agents, keeping the first plies
+    moves of each, and save the resulting book to path."""
+    builder = BookBuilder()
+    for t in range(1, games + 1):
+        records, winner = record_game(reversi, plies)
+        builder.add_game(records, winner)
+        info('game {} of {} complete, {} wins.'.format(t, games, color_name[winner]))
+    builder.save(path)
+    return builder
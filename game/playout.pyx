@@ -0,0 +1,92 @@
+import random
+import time
+from libc.stdint cimport uint64_t
+from game.bitops cimport popcount, lowest_square, move_mask, flip_mask
+from game.bitboard import BitBoard
+from util import BLACK, WHITE
+
+
+cdef inline uint64_t next_random(uint64_t *state) nogil:
+    """xorshift64* generator.  The state must never be zero."""
+    cdef uint64_t x = state[0]
+    x ^= x >> 12
+    x ^= x << 25
+    x ^= x >> 27
+    state[0] = x
+    return x * 0x2545f4914f6cdd1dULL
+
+
+cdef inline int nth_square(uint64_t mask, int n) nogil:
+    """Index of the nth (from zero) set bit of mask."""
+    cdef int i
+    for i in range(n):
+        mask &= mask - 1
+    return lowest_square(mask)
+
+
+cdef int playout(uint64_t own, uint64_t opp, uint64_t *rng) nogil:
+    """Play uniformly random moves until neither side can move.
+    Returns the final disc count of the side that was to move at the
+    start, minus its opponent's."""
+    cdef uint64_t moves, flips, swap
+    cdef int square
+    cdef int sign = 1  # 1 while own belongs to the starting side
+    while True:
+        moves = move_mask(own, opp)
+        if moves == 0:
+            if move_mask(opp, own) == 0:
+                break
+        else:
+            square = nth_square(moves, next_random(rng) % popcount(moves))
+            flips = flip_mask(own, opp, square)
+            own |= flips | ((<uint64_t>1) << square)
+            opp &= ~flips
+
+        # the turn passes to the other side, whether or not a move was made
+        swap = own
+        own = opp
+        opp = swap
+        sign = -sign
+    return sign * (popcount(own) - popcount(opp))
+
+
+def random_playouts(board, color, int count=1, seed=None):
+    """Starting from a BitBoard with color to move, play count random games
+    to completion without holding the GIL.  The board is not modified.
+    Returns the number of games won by color (ties are not wins) and the
+    sum of color's final disc differentials."""
+    cdef uint64_t own, opp
+    cdef uint64_t rng
+    cdef int i, diff
+    cdef int wins = 0
+    cdef long total = 0
+    own, opp = board.masks(color)
+    rng = seed if seed is not None else random.getrandbits(64)
+    if rng == 0:
+        rng = 1  # xorshift gets stuck on zero
+    with nogil:
+        for i in range(count):
+            diff = playout(own, opp, &rng)
+            total += diff
+            if diff > 0:
+                wins += 1
+    return wins, total
+
+
+def random_playout(board, color, seed=None):
+    """Play one random game from a BitBoard with color to move.
+    Returns color's final disc count minus its opponent's."""
+    return random_playouts(board, color, 1, seed)[1]
+
+
+def playouts_per_second(seconds=1.0, batch=1000, seed=None):
+    """Benchmark: how many random playouts from the starting position the
+    compiled kernel completes per second on one core."""
+    board = BitBoard()
+    rng = random.Random(seed)
+    count = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        random_playouts(board, BLACK, batch, rng.getrandbits(64))
+        count += batch
+    return count / (time.time() - start)
@@ -1,8 +1,10 @@
 from copy import deepcopy
 import time
-from game.board import Board, BLACK, WHITE, EMPTY
+from game.board import Board, BLACK, WHITE, EMPTY, state_key
+from game.bitboard import BitBoard
 from agents.random_agent import RandomAgent
 from util import *
+from util.cache_dict import DEFAULT_CAPACITY
 from game.socket_sender import SocketSender
 
 # time in ms to wait between polling move queue for moves from gui
@@ -17,7 +19,14 @@ class Reversi:
         self.gui_enabled = kwargs.get('gui', False)
         self.human_uses_gui = False
         self.socket_sender = None
-        self.board = Board(self.size)
+        if kwargs.get('bitboard', False):
+            self.board = BitBoard(self.size)
+        else:
+            self.board = Board(self.size)
+
+        # positions are the same from game to game, so the legal move
+        # cache (and its statistics) lives as long as this object
+        self.legal_cache = CacheDict(kwargs.get('legal_cache_size', DEFAULT_CAPACITY))
 
         WhiteAgent = kwargs.get('WhiteAgent', RandomAgent)
         BlackAgent = kwargs.get('BlackAgent', RandomAgent)
@@ -38,18 +47,44 @@ class Reversi:
         """Reset the game to initial positions."""
         self.board.init_starting_position()
         self.game_state = (self.board, BLACK)
-        self.legal_cache = CacheDict()
 
         self.white_agent.reset()
         self.black_agent.reset()
 
+    def close(self):
+        """Let both agents release what they hold, such as worker processes.
+        Call this once no more games will be played."""
+        self.white_agent.close()
+        self.black_agent.close()
+
     def play_game(self):
-        board_history = []
+        """Play one game between the agents.  Returns the winner, the white
+        and black stone counts, and the list of boards (as lists of lists)
+        from before the first ply to the end of the game."""
+        board_history = [deepcopy(self.get_state()[0].get_board())]
+        plies = self.game_plies()
+        while True:
+            try:
+                color, picked, state = next(plies)
+            except StopIteration as game_over:
+                winner, white_count, black_count = game_over.value
+                break
+            board_history.append(deepcopy(state[0].get_board()))
+        return winner, white_count, black_count, board_history
+
+    def game_plies(self):
+        """
+        Play one game between the agents, yielding each ply as soon as it is
+        played as a tuple of (color, move, game_state): move is None for a
+        pass, and game_state is the position after it.  Each game_state is
+        a new one, but agents search on its board, so don't modify it.
+        Once the game is over the agents observe the win and the game is
+        reset, and the generator returns (winner, white_count, black_count).
+        """
         state = self.get_state()
         self.print_board(state)
         info('')
         while self.winner(state[0]) is False:
-            board_history.append(deepcopy(state[0].get_board()))
             if self.gui_enabled:
                 self.socket_sender.send_board(state[0])
             color = state[1]
@@ -62,8 +97,7 @@ class Reversi:
             else:
                 info('{} plays at {}'.format(color_name[color], str(picked)))
             info('')
-
-        board_history.append(deepcopy(state[0].get_board()))
+            yield color, picked, state
 
         # Game Over
         self.white_agent.observe_win(state)
@@ -80,7 +114,7 @@ class Reversi:
             self.socket_sender.send_game_over(winner)
 
         self.reset()
-        return winner, white_count, black_count, board_history
+        return winner, white_count, black_count
 
     @staticmethod
     def print_board(state):
@@ -131,18 +165,26 @@ class Reversi:
         return picked
 
     def legal_moves(self, game_state, force_cache=False):
-        # Note: this is a very naive and inefficient way to find
-        # all available moves by brute force.  I am sure there is a
-        # more clever way to do this.  If you want better performance
-        # from agents, this would probably be the first area to improve.
+        # Note: for a list-based Board this is a very naive and inefficient
+        # way to find all available moves by brute force.  A BitBoard
+        # finds them all at once with shifts and masks instead.
+        # cache by key, not by game_state: the board inside a game_state
+        # may be modified in place after its moves were cached
         if force_cache:
-            return self.legal_cache.get(game_state)
+            return self.legal_cache.get(state_key(game_state))
+
+        counters.legal_moves += 1
 
         board = game_state[0]
         if board.is_full():
             return []
 
-        cached = self.legal_cache.get(game_state)
+        if isinstance(board, BitBoard):
+            # cheaper to generate than to look up in the cache
+            return board.legal_moves(game_state[1])
+
+        key = state_key(game_state)
+        cached = self.legal_cache.get(key)
         if cached is not None:
             return cached
 
@@ -156,12 +198,15 @@ class Reversi:
                 if self.is_valid_move(game_state, x, y):
                     moves.append((x, y))
 
-        self.legal_cache.update(game_state, moves)
+        self.legal_cache.update(key, moves)
         return moves
 
     @staticmethod
     def is_valid_move(game_state, int x, int y):
         board, color = game_state
+        if isinstance(board, BitBoard):
+            return board.is_legal(color, x, y)
+
         piece = board.board[y][x]
         if piece != EMPTY:
             return False
@@ -194,22 +239,35 @@ class Reversi:
     def next_state(self, game_state, move):
         """Given a game_state and a position for a new piece, return a new game_state
         reflecting the change.  Does not modify the input game_state."""
+        counters.next_state += 1
         return self.apply_move(deepcopy(game_state), move)
 
     @staticmethod
     def apply_move(game_state, move):
         """Given a game_state (which includes info about whose turn it is) and an x,y
         position to place a piece, transform it into the game_state that follows this play."""
+        return Reversi.make_move(game_state, move)[0]
+
+    @staticmethod
+    def make_move(game_state, move):
+        """Like apply_move, transform game_state in place into the game_state that
+        follows this play, but also return an undo record for unmake_move.
+        Returns a tuple of (new game_state, undo record)."""
+        counters.make_move += 1
 
         # if move is None, then the player simply passed their turn
         if move is None:
             pass_state = (game_state[0], opponent[game_state[1]])
-            return pass_state
+            return pass_state, (game_state, None, None)
 
         cdef int x, y
         x, y = move
         color = game_state[1]
         board = game_state[0]
+        if isinstance(board, BitBoard):
+            flips = board.play(color, x, y)
+            return (board, opponent[color]), (game_state, move, flips)
+
         board.place_stone_at(color, x, y)
 
         # now flip all the stones in every direction
@@ -245,7 +303,26 @@ class Reversi:
         for each in to_flip:
             board.flip_stone(each[0], each[1])
 
-        game_state = (board, opponent[color])
+        return (board, opponent[color]), (game_state, move, to_flip)
+
+    @staticmethod
+    def unmake_move(undo):
+        """Given an undo record from make_move, restore the board to how it was
+        before that move and return the game_state from before the move."""
+        game_state, move, flipped = undo
+        if move is None:
+            return game_state
+
+        cdef int x, y
+        x, y = move
+        board = game_state[0]
+        if isinstance(board, BitBoard):
+            board.unplay(game_state[1], x, y, flipped)
+            return game_state
+
+        for each in flipped:
+            board.flip_stone(each[0], each[1])
+        board.remove_stone_at(x, y)
         return game_state
 
     def winner(self, board):
@@ -263,6 +340,11 @@ class Reversi:
                 return WHITE
 
         # a non-full board can still be game-over if neither player can move.
+        if isinstance(board, BitBoard):
+            if board.has_moves(BLACK) or board.has_moves(WHITE):
+                return False
+            return BLACK if black_count >= white_count else WHITE
+
         black_legal = self.legal_moves((board, BLACK))
         if black_legal:
             return False
@@ -277,6 +359,12 @@ class Reversi:
         else:
             return WHITE
 
+    def cache_stats(self):
+        """Return the legal move cache's size, hit, miss and eviction counts.
+        A BitBoard generates moves faster than it can look them up, so
+        BitBoard games bypass the cache and leave these counts at zero."""
+        return self.legal_cache.stats()
+
     def get_board(self):
         """Return the board from the current game_state."""
         return self.game_state[0]
@@ -4,7 +4,7 @@ import time
 import json
 import sys
 from util import BLACK, WHITE
-from game.board import BLACK_PIECE, WHITE_PIECE
+from game.board import Board, BLACK_PIECE, WHITE_PIECE
 
 HOST = ''
 PORT = 10994
@@ -50,7 +50,7 @@ class SocketSender(SocketParent):
             self.move = (int(x), int(y))
 
     def send_board(self, board):
-        assert type(board).__name__ == 'Board'
+        assert isinstance(board, Board)
         flat_board = self._serialize_board(board)
         try:
             self.send_json(self.connection,
@@ -82,7 +82,7 @@ class SocketSender(SocketParent):
 
     @staticmethod
     def _serialize_board(board):
-        assert type(board).__name__ == 'Board'
+        assert isinstance(board, Board)
         as_str = ''
         board_size = board.size
         for h in range(board_size - 1, -1, -1):
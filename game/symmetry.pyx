@@ -0,0 +1,161 @@
+from libc.stdint cimport uint64_t
+from game.bitboard cimport mask_zobrist
+from game.board import zobrist_keys, WHITE_TO_MOVE_KEY
+from game.bitboard import BitBoard
+from util import WHITE, EMPTY
+
+# The eight symmetries of the square board, numbered as below.  A position
+# and its image under any of them play identically, with moves mapped the
+# same way, so they can share one transposition table or book entry.
+#   0: identity            (x, y)
+#   1: rotate 90           (last - y, x)
+#   2: rotate 180          (last - x, last - y)
+#   3: rotate 270          (y, last - x)
+#   4: mirror x            (last - x, y)
+#   5: mirror y            (x, last - y)
+#   6: transpose           (y, x)
+#   7: anti-transpose      (last - y, last - x)
+TRANSFORMS = 8
+INVERSE = (0, 3, 2, 1, 4, 5, 6, 7)
+
+cdef extern from *:
+    unsigned long long __builtin_bswap64(unsigned long long) nogil
+
+_square_maps = {}
+
+
+def transform_move(move, int transform, int size):
+    """Map an x,y move (or None, a pass) through one of the transforms."""
+    if move is None:
+        return None
+    cdef int x, y
+    cdef int last = size - 1
+    x, y = move
+    if transform == 0:
+        return x, y
+    elif transform == 1:
+        return last - y, x
+    elif transform == 2:
+        return last - x, last - y
+    elif transform == 3:
+        return y, last - x
+    elif transform == 4:
+        return last - x, y
+    elif transform == 5:
+        return x, last - y
+    elif transform == 6:
+        return y, x
+    return last - y, last - x
+
+
+def untransform_move(move, int transform, int size):
+    """Map a move back from a transformed position to the original."""
+    return transform_move(move, INVERSE[transform], size)
+
+
+def square_maps(size):
+    """For each transform, a list mapping square y * size + x to the
+    square it lands on."""
+    if size not in _square_maps:
+        _square_maps[size] = [
+            [y * size + x for x, y in (
+                transform_move((square % size, square // size), t, size)
+                for square in range(size * size))]
+            for t in range(TRANSFORMS)
+        ]
+    return _square_maps[size]
+
+
+cdef inline uint64_t mirror_x(uint64_t b) nogil:
+    b = ((b >> 1) & 0x5555555555555555ULL) | ((b & 0x5555555555555555ULL) << 1)
+    b = ((b >> 2) & 0x3333333333333333ULL) | ((b & 0x3333333333333333ULL) << 2)
+    return ((b >> 4) & 0x0f0f0f0f0f0f0f0fULL) | ((b & 0x0f0f0f0f0f0f0f0fULL) << 4)
+
+
+cdef inline uint64_t mirror_y(uint64_t b) nogil:
+    return __builtin_bswap64(b)
+
+
+cdef inline uint64_t transpose(uint64_t b) nogil:
+    cdef uint64_t t
+    t = 0x0f0f0f0f00000000ULL & (b ^ (b << 28))
+    b ^= t ^ (t >> 28)
+    t = 0x3333000033330000ULL & (b ^ (b << 14))
+    b ^= t ^ (t >> 14)
+    t = 0x5500550055005500ULL & (b ^ (b << 7))
+    return b ^ t ^ (t >> 7)
+
+
+cdef uint64_t transform_mask(uint64_t b, int transform) nogil:
+    """Move every stone of an 8x8 mask through a transform."""
+    if transform == 0:
+        return b
+    elif transform == 1:
+        return mirror_x(transpose(b))
+    elif transform == 2:
+        return mirror_y(mirror_x(b))
+    elif transform == 3:
+        return mirror_y(transpose(b))
+    elif transform == 4:
+        return mirror_x(b)
+    elif transform == 5:
+        return mirror_y(b)
+    elif transform == 6:
+        return transpose(b)
+    return mirror_y(mirror_x(transpose(b)))
+
+
+def canonical_masks(uint64_t black, uint64_t white):
+    """Canonical form of an 8x8 position given as masks: returns the
+    smallest Zobrist key among its eight images, and the transform that
+    produces it."""
+    cdef uint64_t key
+    cdef uint64_t best_key = mask_zobrist(black, white)
+    cdef int t
+    cdef int best = 0
+    for t in range(1, TRANSFORMS):
+        key = mask_zobrist(transform_mask(black, t), transform_mask(white, t))
+        if key < best_key:
+            best_key = key
+            best = t
+    return best_key, best
+
+
+def canonical_board(board):
+    """Canonical form of a list-based Board of any size, chosen by the
+    same rule as canonical_masks, so both engines agree on 8x8 boards."""
+    cdef int size = board.get_size()
+    cdef int square, t
+    keys = zobrist_keys(size)
+    maps = square_maps(size)
+    candidates = [0] * TRANSFORMS
+    square = 0
+    for row in board.board:
+        for piece in row:
+            if piece != EMPTY:
+                color_keys = keys[piece]
+                for t in range(TRANSFORMS):
+                    candidates[t] ^= color_keys[maps[t][square]]
+            square += 1
+    best = min(range(TRANSFORMS), key=candidates.__getitem__)
+    return candidates[best], best
+
+
+def canonical_key(game_state):
+    """
+    Return (key, transform) for a game_state, where key is the state_key
+    of whichever of the position's eight symmetric images has the smallest
+    key, and transform is the one that maps the position onto it.
+    Symmetric positions share a key.  A move in the position corresponds
+    to transform_move(move, transform, size) in the canonical image, and
+    a move stored for the canonical image is played here as
+    untransform_move(stored, transform, size).
+    """
+    board, color = game_state
+    if isinstance(board, BitBoard):
+        key, transform = canonical_masks(board.black, board.white)
+    else:
+        key, transform = canonical_board(board)
+    if color == WHITE:
+        key ^= WHITE_TO_MOVE_KEY
+    return key, transform
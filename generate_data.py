@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+from sys import argv
+from neural_net.self_play import generate, SHARD_ROWS
+from run_game import prop_names
+from util import prop_parse
+
+
+def main(**kwargs):
+
+    input_args = prop_parse(argv)
+    input_args.update(kwargs)
+
+    if 'out' not in input_args:
+        print('necessary inputs:')
+        print('  out=(directory to write the shards and manifest.json to)')
+        print('optional inputs:')
+        print('  games=(#self-play games), processes=(#worker processes)')
+        print('  shard_size=(positions per shard file, default {})'.format(SHARD_ROWS))
+        print('  BlackAgent=, WhiteAgent=, (default random)')
+        print('  any other run_game.py input, such as sim_time, bitboard or seed')
+        print('  (but not workers: self-play games already run in separate processes)')
+        quit()
+
+    out = input_args.pop('out')
+    games = input_args.pop('games', 1000)
+    processes = input_args.pop('processes', 1)
+    shard_rows = input_args.pop('shard_size', SHARD_ROWS)
+    for k, v in input_args.items():
+        if v in prop_names:
+            input_args[k] = prop_names[v]
+
+    manifest = generate(out, games, processes, shard_rows, **input_args)
+    print('wrote {} positions from {} games in {} shards to {}'.format(
+        manifest['positions'], manifest['games'], len(manifest['shards']), out))
+
+
+if __name__ == '__main__':
+    main()
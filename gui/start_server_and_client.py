@@ -40,4 +40,4 @@ def run():
     gui_process.start()
 
     run_game.main(BlackAgent='human', WhiteAgent='monte_carlo',
-                  sim_time=sim_time, gui=True)
+                  sim_time=sim_time, gui=True, bitboard=True)
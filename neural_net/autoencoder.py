@@ -1,8 +1,11 @@
 from keras.layers import Input, Dense
 from keras.models import Model
 import numpy as np
+import os
 
-from game.reversi import Reversi
+from game.batch_reversi import BatchReversi, game_boards
+from neural_net.data_loader import ShardLoader
+from neural_net.self_play import MANIFEST
 
 board_size = 64
 encoded_size = 32
@@ -30,31 +33,26 @@ amount_games = 5000
 epochs = 500
 batch_size = 1000
 
-train = []
-for i in range(amount_games):
-    print('playing train game {}'.format(i))
-    r = Reversi(silent=True)
-    (_, _, _, boards) = r.play_game()
-    numpy_boards = [np.asarray(b).reshape(board_size) for b in boards]
-    train.extend(numpy_boards)
-
-test = []
-for i in range(amount_games):
-    print('playing test game {}'.format(i))
-    r = Reversi(silent=True)
-    (_, _, _, boards) = r.play_game()
-    numpy_boards = [np.asarray(b).reshape(board_size) for b in boards]
-    test.extend(numpy_boards)
-
-
-train_np = np.asarray(train)
-test_np = np.asarray(test)
-
-autoencoder.fit(train_np, train_np,
-                epochs=epochs,
-                batch_size=batch_size,
-                shuffle=True,
-                validation_data=(test_np, test_np))
+# shards written by generate_data.py; when present, training streams
+# from them instead of holding its games in memory
+data_directory = 'self_play_data'
+
+# play all the games at once in the vectorized engine, keeping every board
+test_np = game_boards(*BatchReversi(amount_games).play())
+
+if os.path.exists(os.path.join(data_directory, MANIFEST)):
+    loader = ShardLoader(data_directory, batch_size)
+    autoencoder.fit(loader.batches(),
+                    steps_per_epoch=len(loader),
+                    epochs=epochs,
+                    validation_data=(test_np, test_np))
+else:
+    train_np = game_boards(*BatchReversi(amount_games).play())
+    autoencoder.fit(train_np, train_np,
+                    epochs=epochs,
+                    batch_size=batch_size,
+                    shuffle=True,
+                    validation_data=(test_np, test_np))
 
 input_board = test_np[30]
 encoded_board = encoder.predict(np.reshape(input_board, (1, 64)))
@@ -0,0 +1,123 @@
+import os
+import queue
+import threading
+import numpy as np
+from game.symmetry import TRANSFORMS, INVERSE, square_maps
+from neural_net.self_play import load_manifest
+from util import BLACK, WHITE, EMPTY
+
+# rows of a shard read into memory at a time
+CHUNK_ROWS = 10000
+
+# chunks mixed together before their rows are shuffled into batches
+SHUFFLE_CHUNKS = 4
+
+# batches prepared ahead of the trainer by the background thread
+PREFETCH = 8
+
+# indexed by a shard's stone code (1 black, -1 white, 0 empty), Board's encoding
+CELL_VALUES = np.array([EMPTY, BLACK, WHITE], dtype=np.float32)
+
+
+def gather_maps(size):
+    """A (TRANSFORMS, squares) array: row t lists, for each square of a
+    board under transform t, the square of the original it comes from."""
+    maps = square_maps(size)
+    return np.array([maps[INVERSE[t]] for t in range(TRANSFORMS)], dtype=np.intp)
+
+
+def augment(rows, size, rng):
+    """Return a copy of rows with each board put through a random one of
+    the eight symmetries, drawn separately for every row, so one batch
+    mixes all eight.  The rows are transformed together in one gather.
+    The side to move and outcome columns don't change under a symmetry."""
+    squares = size * size
+    transforms = rng.integers(TRANSFORMS, size=len(rows))
+    augmented = rows.copy()
+    augmented[:, :squares] = np.take_along_axis(
+        rows[:, :squares], gather_maps(size)[transforms], axis=1)
+    return augmented
+
+
+def autoencoder_batch(rows, size):
+    """Turn shard rows into an (inputs, targets) pair for the autoencoder:
+    the boards as cells in Board's encoding, reproducing themselves."""
+    cells = CELL_VALUES[rows[:, :size * size]]
+    return cells, cells
+
+
+class ShardLoader:
+    """
+    Streams the positions of a self-play dataset (see self_play.generate)
+    in shuffled batches, reading chunk_rows rows of a shard at a time so
+    that only a few chunks are ever in memory.  Each epoch visits every
+    chunk once in a new random order, and mixes shuffle_chunks chunks at a
+    time before dealing their rows out in random order.  With augment, every
+    row of a batch gets its own random symmetry (see augment).  make_batch
+    turns a batch of int8 rows into whatever the model is fit on.
+    """
+
+    def __init__(self, directory, batch_size=1000, **kwargs):
+        self.directory = directory
+        self.manifest = load_manifest(directory)
+        self.size = self.manifest['board_size']
+        self.batch_size = batch_size
+        self.chunk_rows = kwargs.get('chunk_rows', CHUNK_ROWS)
+        self.shuffle_chunks = kwargs.get('shuffle_chunks', SHUFFLE_CHUNKS)
+        self.prefetch = kwargs.get('prefetch', PREFETCH)
+        self.augment = kwargs.get('augment', True)
+        self.make_batch = kwargs.get('make_batch', autoencoder_batch)
+        self.rng = np.random.default_rng(kwargs.get('seed', None))
+
+        self.shards = [np.load(os.path.join(directory, shard['file']), mmap_mode='r')
+                       for shard in self.manifest['shards']]
+        self.chunks = [(i, start, min(start + self.chunk_rows, shard['rows']))
+                       for i, shard in enumerate(self.manifest['shards'])
+                       for start in range(0, shard['rows'], self.chunk_rows)]
+
+    def __len__(self):
+        """Batches per epoch, for Keras' steps_per_epoch."""
+        return -(-self.manifest['positions'] // self.batch_size)
+
+    def read_chunks(self, chunks):
+        """Copy some chunks out of their shards into one shuffled array."""
+        rows = np.concatenate([self.shards[i][start:end] for i, start, end in chunks])
+        return rows[self.rng.permutation(len(rows))]
+
+    def epoch(self):
+        """Yield one epoch of batches, the last of them possibly short."""
+        order = self.rng.permutation(len(self.chunks))
+        leftover = None
+        for first in range(0, len(order), self.shuffle_chunks):
+            chunks = [self.chunks[i] for i in order[first:first + self.shuffle_chunks]]
+            rows = self.read_chunks(chunks)
+            if leftover is not None:
+                rows = np.concatenate([leftover, rows])
+            whole = len(rows) - len(rows) % self.batch_size
+            for start in range(0, whole, self.batch_size):
+                yield self.batch(rows[start:start + self.batch_size])
+            leftover = rows[whole:]
+        if leftover is not None and len(leftover):
+            yield self.batch(leftover)
+
+    def batch(self, rows):
+        if self.augment:
+            rows = augment(rows, self.size, self.rng)
+        return self.make_batch(rows, self.size)
+
+    def batches(self):
+        """
+        Yield batches forever, epoch after epoch, as Keras' fit expects of a
+        generator.  They are read, shuffled and augmented by a background
+        thread, up to prefetch batches ahead, so the trainer rarely waits.
+        """
+        ready = queue.Queue(self.prefetch)
+
+        def produce():
+            while True:
+                for batch in self.epoch():
+                    ready.put(batch)
+
+        threading.Thread(target=produce, daemon=True).start()
+        while True:
+            yield ready.get()
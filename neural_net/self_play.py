@@ -0,0 +1,159 @@
+import json
+import multiprocessing
+import os
+import numpy as np
+from game.batch_reversi import SQUARE_BITS
+from game.bitboard import BitBoard
+from game.reversi import Reversi
+from util import BLACK, WHITE, EMPTY
+
+# Every shard is an int8 .npy array of SHARD_ROWS rows, one per position:
+# a column per square (y * size + x) holding STONE_CODES of its stone,
+# then SIDE_TO_MOVE, then OUTCOME.  The last shard of a worker may be only
+# partly filled; the manifest records how many rows of each shard are real.
+STONE_CODES = {BLACK: 1, WHITE: -1, EMPTY: 0}
+SIDE_TO_MOVE = -2  # column: 1 if black is to move, -1 if white is
+OUTCOME = -1       # column: 1 if black won the game, -1 if white did, 0 for a draw
+
+SHARD_ROWS = 100000
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def position_row(game_state, size):
+    """Encode a game state as one int8 row, without the outcome."""
+    board, color = game_state
+    row = np.zeros(size * size + 2, dtype=np.int8)
+    if isinstance(board, BitBoard):
+        row[:64] = (np.uint64(board.black) & SQUARE_BITS) != 0
+        row[:64] -= (np.uint64(board.white) & SQUARE_BITS) != 0
+    else:
+        row[:size * size] = [STONE_CODES[piece] for line in board.board for piece in line]
+    row[SIDE_TO_MOVE] = STONE_CODES[color]
+    return row
+
+
+def game_rows(reversi):
+    """Play one game with reversi's agents and return its positions, one
+    row for the position before each ply, outcome included."""
+    size = reversi.size
+    rows = [position_row(reversi.get_state(), size)]
+    plies = reversi.game_plies()
+    while True:
+        try:
+            color, move, state = next(plies)
+        except StopIteration as game_over:
+            _, white_count, black_count = game_over.value
+            break
+        rows.append(position_row(state, size))
+
+    # the final position has no move to learn from
+    rows = np.array(rows[:-1])
+    rows[:, OUTCOME] = np.sign(black_count - white_count)
+    return rows
+
+
+class ShardWriter:
+    """Fills fixed-size memory-mapped shards with rows, starting a new
+    shard file whenever the current one is full, so that no more than one
+    game's rows are ever held in memory."""
+
+    def __init__(self, directory, prefix, columns, shard_rows=SHARD_ROWS):
+        self.directory = directory
+        self.prefix = prefix
+        self.columns = columns
+        self.shard_rows = shard_rows
+        self.shards = []  # {'file': name, 'rows': rows in use}
+        self.shard = None
+
+    def open_shard(self):
+        name = '{}-{:05d}.npy'.format(self.prefix, len(self.shards))
+        self.shard = np.lib.format.open_memmap(
+            os.path.join(self.directory, name), mode='w+',
+            dtype=np.int8, shape=(self.shard_rows, self.columns))
+        self.shards.append({'file': name, 'rows': 0})
+
+    def write(self, rows):
+        while len(rows):
+            if self.shard is None or self.shards[-1]['rows'] == self.shard_rows:
+                self.close_shard()
+                self.open_shard()
+            start = self.shards[-1]['rows']
+            amount = min(len(rows), self.shard_rows - start)
+            self.shard[start:start + amount] = rows[:amount]
+            self.shards[-1]['rows'] += amount
+            rows = rows[amount:]
+
+    def close_shard(self):
+        if self.shard is not None:
+            self.shard.flush()
+            self.shard = None
+
+
+def self_play_worker(task):
+    """Pool task: play games games and write their positions to shards.
+    Returns the worker's shard list and the number of games played."""
+    index, games, directory, shard_rows, args = task
+    args = dict(args)
+    args['silent'] = True
+    if 'seed' in args:
+        args['seed'] += index
+    reversi = Reversi(**args)
+    writer = ShardWriter(directory, 'worker{:03d}'.format(index),
+                         reversi.size ** 2 + 2, shard_rows)
+    for _ in range(games):
+        writer.write(game_rows(reversi))
+    writer.close_shard()
+    reversi.close()
+    return writer.shards, games
+
+
+def generate(directory, games, processes, shard_rows=SHARD_ROWS, **args):
+    """
+    Play games self-play games on processes worker processes, with the
+    agents and options in args as run_game takes them, writing every
+    position to int8 shards in directory plus a manifest describing them.
+    Returns the manifest.  Games already run in a process pool, which can't
+    start pools of its own, so monte carlo's workers= option isn't
+    available here.
+    """
+    if args.get('workers', 1) > 1:
+        raise ValueError('workers= can\'t be used for self-play: games already '
+                         'run in a process pool, which can\'t start pools of its own')
+    os.makedirs(directory, exist_ok=True)
+    shares = [games // processes + (1 if i < games % processes else 0)
+              for i in range(processes)]
+    tasks = [(i, share, directory, shard_rows, args) for i, share in enumerate(shares)]
+    with multiprocessing.Pool(processes) as pool:
+        finished = pool.map(self_play_worker, tasks, chunksize=1)
+
+    shards = [shard for worker_shards, _ in finished for shard in worker_shards]
+    size = args.get('size', 8)
+    manifest = {
+        'version': FORMAT_VERSION,
+        'board_size': size,
+        'columns': size * size + 2,
+        'stone_codes': {'black': STONE_CODES[BLACK], 'white': STONE_CODES[WHITE],
+                        'empty': STONE_CODES[EMPTY]},
+        'side_to_move_column': size * size,
+        'outcome_column': size * size + 1,
+        'games': sum(count for _, count in finished),
+        'positions': sum(shard['rows'] for shard in shards),
+        'shards': shards,
+    }
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        return json.load(f)
+
+
+def open_shards(directory):
+    """Return the real rows of every shard listed in directory's manifest,
+    each as a read-only memory-mapped array."""
+    manifest = load_manifest(directory)
+    return [np.load(os.path.join(directory, shard['file']), mmap_mode='r')[:shard['rows']]
+            for shard in manifest['shards']]
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+import time
+from sys import argv
+from game.reversi import Reversi
+from util import prop_parse, opponent, BLACK, WHITE, EMPTY
+
+# leaf counts from the standard 8x8 starting position, by depth
+KNOWN_COUNTS = {
+    1: 4,
+    2: 12,
+    3: 56,
+    4: 244,
+    5: 1396,
+    6: 8200,
+    7: 55092,
+    8: 390216,
+    9: 3005288,
+    10: 24571284,
+    11: 212258800,
+}
+
+PIECES = {'X': BLACK, 'O': WHITE, '-': EMPTY}
+
+
+def perft(reversi, game_state, depth):
+    """
+    Count the leaves of the game tree below game_state, depth plies deep.
+    A pass counts as a ply, and a game that ends before depth plies
+    counts as a single leaf.  Moves are made and unmade on the game
+    state's board, which is left as it was found.
+    """
+    if depth < 1:
+        return 1  # the position itself is the only leaf
+    moves = reversi.legal_moves(game_state)
+    if not moves:
+        board, color = game_state
+        if not reversi.legal_moves((board, opponent[color])):
+            return 1
+        moves = [None]
+    if depth == 1:
+        return len(moves)
+
+    leaves = 0
+    for move in moves:
+        next_state, undo = reversi.make_move(game_state, move)
+        leaves += perft(reversi, next_state, depth - 1)
+        reversi.unmake_move(undo)
+    return leaves
+
+
+def divide(reversi, game_state, depth):
+    """Return a dict of move: perft count below that move."""
+    moves = reversi.legal_moves(game_state) or [None]
+    counts = {}
+    for move in moves:
+        next_state, undo = reversi.make_move(game_state, move)
+        counts[move] = perft(reversi, next_state, depth - 1) if depth > 1 else 1
+        reversi.unmake_move(undo)
+    return counts
+
+
+def parse_position(reversi, text, turn):
+    """Set up reversi's board from text, one character per square in
+    row order (X black, O white, - empty), and return the game state
+    with turn ('black' or 'white') to move."""
+    board = reversi.get_board()
+    size = board.get_size()
+    assert len(text) == size * size, 'position needs {} squares'.format(size * size)
+    for square, char in enumerate(text):
+        x, y = square % size, square // size
+        piece = PIECES[char]
+        # clear the square first, as place_stone_at only counts the new stone
+        if board.piece_at(x, y) != EMPTY:
+            board.remove_stone_at(x, y)
+        if piece != EMPTY:
+            board.place_stone_at(piece, x, y)
+    return board, BLACK if turn == 'black' else WHITE
+
+
+def main(**kwargs):
+
+    input_args = prop_parse(argv)
+    input_args.update(kwargs)
+
+    if 'depth' not in input_args:
+        print('necessary inputs:')
+        print('  depth=(plies to count to)')
+        print('optional inputs:')
+        print('  bitboard=(True/False, use the 64-bit mask engine for 8x8 games), size=(board size)')
+        print('  position=(squares in row order, X black, O white, - empty), turn=(black/white)')
+        print('  divide=(True/False, print the count below each move)')
+        quit()
+
+    reversi = Reversi(size=input_args.get('size', 8),
+                      bitboard=input_args.get('bitboard', False), silent=True)
+    state = reversi.get_state()
+    if 'position' in input_args:
+        state = parse_position(reversi, input_args['position'], input_args.get('turn', 'black'))
+    depth = input_args['depth']
+    if not isinstance(depth, int) or depth < 1:
+        print('depth must be a whole number of plies, at least 1.')
+        quit(1)
+
+    start = time.time()
+    if input_args.get('divide', False):
+        counts = divide(reversi, state, depth)
+        for move, count in counts.items():
+            print('{}: {}'.format(move, count))
+        leaves = sum(counts.values())
+    else:
+        leaves = perft(reversi, state, depth)
+    seconds = time.time() - start
+
+    print('perft({}) = {} in {:.2f}s ({:.0f} nodes/s)'.format(
+        depth, leaves, seconds, leaves / seconds if seconds else 0))
+
+    starting = 'position' not in input_args and reversi.size == 8
+    if starting and depth in KNOWN_COUNTS:
+        if leaves == KNOWN_COUNTS[depth]:
+            print('matches the known count.')
+        else:
+            print('MISMATCH: the known count is {}.'.format(KNOWN_COUNTS[depth]))
+            quit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,14 +2,17 @@
 from sys import argv
 import time
 from game.reversi import Reversi
-from agents import random_agent, monte_carlo_agent, human_agent
-from util import prop_parse, make_silent, info
+from agents import random_agent, monte_carlo_agent, human_agent, alpha_beta_agent
+import tournament
+from game.game_record import GameWriter, play_recorded_game
+from util import prop_parse, make_silent, info, color_name, BLACK, WHITE
 
 prop_names = {
     # agent names. if user passes BlackAgent=human, becomes human_agent.Hu...
     'monte_carlo': monte_carlo_agent.MonteCarloAgent,
     'random': random_agent.RandomAgent,
     'human': human_agent.HumanAgent,
+    'alpha_beta': alpha_beta_agent.AlphaBetaAgent,
 }
 
 
@@ -21,9 +24,25 @@ def main(**kwargs):
     if len(argv) <= 1 and len(kwargs) <= 1:
         print('necessary inputs:')
         print('  BlackAgent=, WhiteAgent=,')
-        print('    choices: q_learning, monte_carlo, random, human')
+        print('    choices: q_learning, monte_carlo, alpha_beta, random, human')
         print('optional inputs:')
         print('  size=(board size), amount=(#games), silent=(True/False), sim_time=(seconds for monte carlo sim)')
+        print('  bitboard=(True/False, use the 64-bit mask engine for 8x8 games)')
+        print('  legal_cache_size=(max positions kept in the legal move cache)')
+        print('  workers=(processes for root-parallel monte carlo search)')
+        print('  threads=(threads sharing one tree in monte carlo search)')
+        print('  max_nodes=(most nodes a monte carlo tree may hold)')
+        print('  array_tree=(True/False, keep the monte carlo tree in NumPy arrays)')
+        print('  sim_count=(simulations per monte carlo move, instead of sim_time)')
+        print('  seed=(random seed, for repeatable monte carlo searches)')
+        print('  search_time=(seconds per alpha beta move), max_depth=(deepest alpha beta iteration)')
+        print('  table_size=(max positions kept in the alpha beta transposition table)')
+        print('  symmetry=(True/False, share alpha beta table entries between symmetric positions)')
+        print('  endgame_empties=(solve exactly from this many empty squares, 0 to never solve)')
+        print('  book=(opening book .npy file for monte carlo, see build_opening_book.py)')
+        print('  book_min_plays=(fewest games behind a book move before it is played)')
+        print('  processes=(play the games as a tournament on this many processes, alternating colors)')
+        print('  record=(file to write every game to, in the one byte per ply format of game/game_record.py)')
         quit()
 
     for k, v in input_args.items():
@@ -35,14 +54,22 @@ def main(**kwargs):
             input_args[k] = q_learning_agent.QLearningAgent
 
     if any(val == monte_carlo_agent.MonteCarloAgent for val in input_args.values()) \
-            and not input_args.get('sim_time', False):
-        print('sim_time field required for monte_carlo agent.')
+            and not input_args.get('sim_time', False) \
+            and not input_args.get('sim_count', False):
+        print('sim_time or sim_count field required for monte_carlo agent.')
         print('quitting.')
         quit()
 
     amount = input_args.get('amount', 1)
     make_silent(input_args.get('silent', False))
 
+    if input_args.get('processes', None):
+        print('About to run a {} game tournament, {} against {}, on {} processes.'.format(
+            amount, input_args['BlackAgent'].__name__, input_args['WhiteAgent'].__name__,
+            input_args['processes']))
+        results = tournament.run_tournament(input_args, amount, input_args['processes'])
+        return {results.first_name: results.win_rate() * 100}
+
     print('About to run {} games, black as {}, white as {}.'.format(
         amount, input_args['BlackAgent'].__name__, input_args['WhiteAgent'].__name__)
     )
@@ -51,10 +78,17 @@ def main(**kwargs):
     white_wins = 0
     black_wins = 0
     reversi = Reversi(**input_args)
+    record_file = None
+    if input_args.get('record', None):
+        record_file = open(input_args['record'], 'wb')
+        writer = GameWriter(record_file, reversi.size)
     start = time.time()
     for t in range(1, amount + 1):
         info('starting game {} of {}'.format(t, amount))
-        winner, white_score, black_score = reversi.play_game()
+        if record_file is not None:
+            winner, white_score, black_score = play_recorded_game(reversi, writer)
+        else:
+            winner, white_score, black_score, _ = reversi.play_game()
         if winner == WHITE:
             white_wins += 1
         elif winner == BLACK:
@@ -66,6 +100,10 @@ def main(**kwargs):
         summary.append(message)
 
     seconds_spent = time.time() - start
+    reversi.close()
+    if record_file is not None:
+        record_file.close()
+        print('recorded {} games to {}'.format(writer.games, input_args['record']))
     ms_per_game = (seconds_spent / amount) * 1000
     print('time: {0:.2f} minutes ({0:.2f}ms per game)'.format(
         seconds_spent / 60, ms_per_game))
@@ -77,6 +115,17 @@ def main(**kwargs):
     print('Black won {}%'.format(wins['Black']))
     print('White won {}%'.format(wins['White']))
 
+    stats = reversi.cache_stats()
+    print('legal move cache: {hits} hits, {misses} misses, {evictions} evictions, '
+          '{hit_rate:.1%} hit rate ({size}/{capacity} entries)'.format(**stats))
+
+    for color, agent in ((BLACK, reversi.black_agent), (WHITE, reversi.white_agent)):
+        agent_stats = getattr(agent, 'total_stats', None)
+        if agent_stats is not None and agent_stats.searches:
+            print('{} search statistics:'.format(color_name[color]))
+            for line in agent_stats.summary():
+                print('  ' + line)
+
     return wins
 
 
@@ -0,0 +1,133 @@
+import math
+import multiprocessing
+import time
+from game.reversi import Reversi
+
+
+def game_args(input_args, index):
+    """The Reversi arguments for game number index of a tournament.
+    Every other game swaps the agents' colors, and a seed is offset by
+    the game number so that games differ but can be replayed."""
+    args = dict(input_args)
+    args['silent'] = True  # output from parallel games would interleave
+    if index % 2 == 1:
+        args['BlackAgent'] = input_args['WhiteAgent']
+        args['WhiteAgent'] = input_args['BlackAgent']
+    if 'seed' in input_args:
+        args['seed'] = input_args['seed'] + index
+    return args
+
+
+def play_tournament_game(task):
+    """Pool task: play one game and return (index, white_count,
+    black_count, seconds)."""
+    index, args = task
+    reversi = Reversi(**args)
+    start = time.time()
+    _, white_count, black_count, _ = reversi.play_game()
+    reversi.close()
+    return index, white_count, black_count, time.time() - start
+
+
+class TournamentResults:
+    """Running totals from the point of view of the first agent, the one
+    passed as BlackAgent, which plays black in even-numbered games."""
+
+    def __init__(self, first_name, second_name):
+        self.first_name = first_name
+        self.second_name = second_name
+        self.games = 0
+        self.wins = 0
+        self.draws = 0
+        self.wins_as = {'black': 0, 'white': 0}
+        self.games_as = {'black': 0, 'white': 0}
+        self.diff_total = 0
+        self.diff_squares = 0
+        self.seconds = 0.0
+
+    def add(self, index, white_count, black_count, seconds):
+        """Count one game.  Returns a line describing it."""
+        first_color = 'black' if index % 2 == 0 else 'white'
+        if first_color == 'black':
+            first_count, second_count = black_count, white_count
+        else:
+            first_count, second_count = white_count, black_count
+        diff = first_count - second_count
+
+        self.games += 1
+        self.games_as[first_color] += 1
+        self.diff_total += diff
+        self.diff_squares += diff * diff
+        self.seconds += seconds
+        if diff > 0:
+            self.wins += 1
+            self.wins_as[first_color] += 1
+            outcome = 'beat'
+        elif diff == 0:
+            self.draws += 1
+            outcome = 'drew with'
+        else:
+            outcome = 'lost to'
+
+        return 'game {}: {} ({}) {} {} {}-{} in {:.2f}s'.format(
+            index + 1, self.first_name, first_color, outcome, self.second_name,
+            first_count, second_count, seconds)
+
+    def win_rate(self):
+        """Wins plus half of draws, over games played."""
+        return (self.wins + self.draws / 2) / self.games if self.games else 0.0
+
+    def mean_diff(self):
+        return self.diff_total / self.games if self.games else 0.0
+
+    def diff_stderr(self):
+        """Standard error of the mean disc differential."""
+        if self.games < 2:
+            return 0.0
+        variance = (self.diff_squares - self.games * self.mean_diff() ** 2) / (self.games - 1)
+        return math.sqrt(max(variance, 0.0) / self.games)
+
+    def summary(self):
+        """Return the aggregated results as a list of lines."""
+        losses = self.games - self.wins - self.draws
+        lines = [
+            '{} vs {}: {} games, {} wins, {} draws, {} losses'.format(
+                self.first_name, self.second_name, self.games, self.wins, self.draws, losses),
+            '{} win rate: {:.1%}'.format(self.first_name, self.win_rate()),
+        ]
+        for color in ('black', 'white'):
+            if self.games_as[color]:
+                lines.append('  as {}: {}/{} wins'.format(
+                    color, self.wins_as[color], self.games_as[color]))
+        lines.append('disc differential: {:+.2f} +/- {:.2f} per game'.format(
+            self.mean_diff(), self.diff_stderr()))
+        lines.append('{:.2f}s per game'.format(
+            self.seconds / self.games if self.games else 0.0))
+        return lines
+
+
+def run_tournament(input_args, amount, processes):
+    """
+    Play amount games between input_args' BlackAgent and WhiteAgent on a
+    pool of processes, alternating colors, and print each result as soon
+    as its game finishes.  Returns the TournamentResults.
+    Agents can't start processes of their own from inside the pool, so
+    monte carlo's workers= option isn't available here.
+    """
+    if input_args.get('workers', 1) > 1:
+        raise ValueError('workers= can\'t be used in a tournament: games already '
+                         'run in a process pool, which can\'t start pools of its own')
+    results = TournamentResults(input_args['BlackAgent'].__name__,
+                                input_args['WhiteAgent'].__name__)
+    tasks = [(index, game_args(input_args, index)) for index in range(amount)]
+    start = time.time()
+    with multiprocessing.Pool(processes) as pool:
+        for game in pool.imap_unordered(play_tournament_game, tasks):
+            print(results.add(*game))
+
+    seconds_spent = time.time() - start
+    for line in results.summary():
+        print(line)
+    print('wall time: {:.2f}s for {} games on {} processes'.format(
+        seconds_spent, amount, processes))
+    return results
@@ -1,3 +1,7 @@
-from util.util import color_name, BLACK, WHITE, EMPTY, make_silent, info, opponent, is_in_bounds
+from util.util import color_name, BLACK, WHITE, EMPTY, make_silent, info, opponent, is_in_bounds, \
+    numpify, numpify_states, best_move_val
 from util.cache_dict import CacheDict
 from util.prop_parse import prop_parse
+from util.search_budget import SearchBudget
+from util.instrumentation import counters, SearchStats
+from util.replay_memory import ReplayMemory
@@ -1,28 +1,61 @@
-K = 0
-V = 1
+import threading
+from collections import OrderedDict
+
+DEFAULT_CAPACITY = 10000
 
 
 class CacheDict:
+    """A bounded cache that evicts its least recently used entry once it
+    holds more than `capacity` entries.  Keys should be cheap to hash and
+    compare, such as state_key() ints.  Counts hits, misses and evictions
+    so the capacity can be tuned from real numbers.  Safe to share between
+    threads."""
 
-    def __init__(self):
-        self.c_list = []
-        self.flip = True
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        assert capacity > 0
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
 
     def update(self, k, v):
-        if len(self.c_list) < 2:
-            self.c_list.append((k, v))
-        else:
-            if self.flip:
-                self.c_list[0] = (k, v)
-            else:
-                self.c_list[1] = (k, v)
-            self.flip = not self.flip
+        with self.lock:
+            if k in self.entries:
+                self.entries.move_to_end(k)
+            self.entries[k] = v
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
 
     def get(self, k):
-        size = len(self.c_list)
-        if size >= 1 and self.c_list[0][K] == k:
-            return self.c_list[0][V]
-        elif size >= 2 and self.c_list[1][K] == k:
-            return self.c_list[1][V]
-        else:
-            return None
+        with self.lock:
+            v = self.entries.get(k)
+            if v is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(k)
+            return v
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'capacity': self.capacity,
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate(),
+        }
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,87 @@
+COUNTER_NAMES = ('legal_moves', 'make_move', 'next_state')
+
+PHASES = ('selection', 'expansion', 'playout', 'backprop')
+
+
+class Counters:
+    """Process-wide counts of calls into the game engine.  Reversi bumps
+    these as it works, which costs an attribute increment per call.
+    To count the calls made by some piece of work, take a snapshot()
+    before it and pass that to since() afterwards."""
+
+    def __init__(self):
+        self.legal_moves = 0  # Reversi.legal_moves calls
+        self.make_move = 0    # make_move calls, including through apply_move
+        self.next_state = 0   # next_state calls, each a deep copy
+
+    def snapshot(self):
+        return tuple(getattr(self, name) for name in COUNTER_NAMES)
+
+    def since(self, snapshot):
+        """Return a dict of name: calls made since the snapshot was taken."""
+        return {name: getattr(self, name) - before
+                for name, before in zip(COUNTER_NAMES, snapshot)}
+
+
+counters = Counters()
+
+
+class SearchStats:
+    """What a search, or the sum of several, did and where its time went.
+    Times are in seconds; the phase times are summed over simulations,
+    so with several threads they can add up to more than seconds."""
+
+    def __init__(self):
+        self.searches = 0
+        self.simulations = 0
+        self.seconds = 0.0
+        self.nodes_created = 0
+        self.total_depth = 0  # summed over simulations, see mean_depth
+        self.max_depth = 0
+        self.legal_moves = 0
+        self.legal_cache_hits = 0
+        self.make_move = 0
+        self.next_state = 0
+        self.selection_time = 0.0
+        self.expansion_time = 0.0
+        self.playout_time = 0.0
+        self.backprop_time = 0.0
+
+    def add_counts(self, counts):
+        """Add a dict of engine call counts, as from Counters.since."""
+        for name, count in counts.items():
+            setattr(self, name, getattr(self, name) + count)
+
+    def add(self, other):
+        """Add another SearchStats into this one."""
+        for name, value in vars(other).items():
+            if name == 'max_depth':
+                self.max_depth = max(self.max_depth, value)
+            else:
+                setattr(self, name, getattr(self, name) + value)
+
+    def mean_depth(self):
+        """Mean depth below the root of the nodes simulated from."""
+        return self.total_depth / self.simulations if self.simulations else 0.0
+
+    def as_dict(self):
+        result = dict(vars(self))
+        result['mean_depth'] = self.mean_depth()
+        return result
+
+    def summary(self):
+        """Return the statistics as a list of lines for printing."""
+        rate = self.simulations / self.seconds if self.seconds else 0.0
+        lines = [
+            '{} searches, {} simulations in {:.2f}s ({:.0f} per second)'.format(
+                self.searches, self.simulations, self.seconds, rate),
+            'nodes created: {}, tree depth: {:.1f} mean, {} max'.format(
+                self.nodes_created, self.mean_depth(), self.max_depth),
+            'engine calls: {} legal_moves ({} cache hits), {} make_move, {} next_state'.format(
+                self.legal_moves, self.legal_cache_hits, self.make_move, self.next_state),
+        ]
+        if self.seconds:
+            lines.append('time: ' + ', '.join(
+                '{} {:.1%}'.format(phase, getattr(self, phase + '_time') / self.seconds)
+                for phase in PHASES))
+        return lines
@@ -0,0 +1,82 @@
+import numpy as np
+
+# the value of a move to a position with no legal moves, before it's masked out
+ILLEGAL = -np.inf
+
+
+class ReplayMemory:
+    """
+    A fixed number of past transitions for Q-learning, kept in preallocated
+    NumPy arrays used as a ring buffer: once capacity transitions have been
+    remembered, each new one overwrites the oldest.  Boards are stored in
+    the same row-order cell encoding as util.numpify.
+    """
+
+    def __init__(self, capacity, size=8, **kwargs):
+        squares = size * size
+        self.capacity = capacity
+        self.size = size
+        self.discount = kwargs.get('discount', 1.0)
+        self.rng = np.random.default_rng(kwargs.get('seed', None))
+
+        self.states = np.zeros((capacity, squares), dtype=np.float32)
+        self.moves = np.zeros(capacity, dtype=np.intp)  # y * size + x
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, squares), dtype=np.float32)
+        self.next_legal = np.zeros((capacity, squares), dtype=bool)
+        self.done = np.zeros(capacity, dtype=bool)
+
+        self.next_index = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def remember(self, state, move, reward, next_state, legal_moves, winner):
+        """Store one transition: move played in state earned reward and led
+        to next_state, where legal_moves may be played.  winner is False
+        unless the game ended there."""
+        i = self.next_index
+        self.states[i] = [piece for row in state[0].board for piece in row]
+        self.moves[i] = move[1] * self.size + move[0]
+        self.rewards[i] = reward
+        self.next_states[i] = [piece for row in next_state[0].board for piece in row]
+        self.next_legal[i] = False
+        for x, y in legal_moves:
+            self.next_legal[i, y * self.size + x] = True
+        self.done[i] = winner is not False
+
+        self.next_index = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def sample(self, batch_size):
+        """Return the indices of a random minibatch, without repeats unless
+        fewer than batch_size transitions are stored."""
+        if self.count >= batch_size:
+            return self.rng.choice(self.count, batch_size, replace=False)
+        return self.rng.integers(self.count, size=batch_size)
+
+    def get_replay(self, model, batch_size, alpha):
+        """
+        Sample a minibatch and return (states, targets) to train model on.
+        The targets are the model's own q values for each state, with the
+        value of the move played moved alpha of the way towards its reward
+        plus the discounted best q value of the next state (just the reward
+        if the game ended or the next state has no legal moves).  States and next states share one predict call.
+        """
+        assert self.count, "can't replay from an empty memory"
+        batch = self.sample(batch_size)
+        states = self.states[batch]
+        q_vals = model.predict(np.concatenate([states, self.next_states[batch]]))
+        targets, next_q = q_vals[:batch_size], q_vals[batch_size:]
+
+        next_legal = self.next_legal[batch]
+        best_next = np.where(next_legal, next_q, ILLEGAL).max(axis=1)
+        # a finished game, or a pass, has no next move to value
+        best_next[self.done[batch] | ~next_legal.any(axis=1)] = 0.0
+        goal = self.rewards[batch] + self.discount * best_next
+
+        rows = np.arange(batch_size)
+        moves = self.moves[batch]
+        targets[rows, moves] += alpha * (goal - targets[rows, moves])
+        return states, targets
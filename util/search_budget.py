@@ -0,0 +1,36 @@
+import time
+
+# aim to read the clock about this often (in seconds) during a search
+CLOCK_CHECK_PERIOD = 0.005
+
+
+class SearchBudget:
+    """Decides when a search should stop.  Given a sim_count, it allows
+    exactly that many simulations, so the work done is the same on any
+    machine.  Otherwise it allows sim_time seconds, but only reads the
+    clock every so many simulations, choosing the interval from the rate
+    measured so far so that checks happen about every CLOCK_CHECK_PERIOD.
+    The interval at most doubles from one check to the next, so a rate
+    measured over the first few, nearly instant, simulations can't push
+    the next check far past the end of the budget."""
+
+    def __init__(self, sim_time, sim_count=None, start=None):
+        self.sim_time = sim_time
+        self.sim_count = sim_count
+        self.start = time.time() if start is None else start
+        self.next_check = 1
+
+    def running(self, sims_done):
+        """Return True if the search may run another simulation."""
+        if self.sim_count is not None:
+            return sims_done < self.sim_count
+        if sims_done < self.next_check:
+            return True
+
+        elapsed = time.time() - self.start
+        if elapsed >= self.sim_time:
+            return False
+        rate = sims_done / elapsed if elapsed > 0 else sims_done
+        interval = max(1, int(rate * CLOCK_CHECK_PERIOD))
+        self.next_check = sims_done + min(interval, max(1, sims_done))
+        return True
@@ -1,5 +1,6 @@
 import math
 import random
+import numpy as np
 
 BLACK = 1.0
 WHITE = 0.5
@@ -30,6 +31,19 @@ def to_offset(move, size):
     return y * size + x
 
 
+def numpify(state):
+    """Given a game state, return its board as a (1, size * size) array
+    of cells in row order, as the Q-learning model takes it."""
+    return numpify_states([state])
+
+
+def numpify_states(states):
+    """Given a list of game states, return their boards as one
+    (len(states), size * size) array, for a single batched predict."""
+    return np.array([[piece for row in state[0].board for piece in row] for state in states],
+                    dtype=np.float32)
+
+
 def is_in_bounds(x, y, size):
     return 0 <= x < size and 0 <= y < size
 